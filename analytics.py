@@ -0,0 +1,124 @@
+import math
+import time
+from dataclasses import dataclass, field
+import numpy as np
+import pandas as pd
+from api_cache import TTLCache
+from board import Board
+from timestamps import SAO_PAULO_TZ
+
+# Percentis do tempo de ciclo (criação -> conclusão) calculados em cada agrupamento
+CYCLE_TIME_PERCENTILES = (0.5, 0.9, 0.95)
+
+# Quantidade de dias (incluindo hoje) nas séries de conclusões por dia
+THROUGHPUT_DAYS = 30
+
+# Tempo (segundos) que os indicadores de uma versão do quadro ficam em cache. A versão
+# só muda quando as tarefas mudam; o TTL limita o atraso da contagem de vencidas,
+# que depende do horário atual.
+ANALYTICS_TTL = 60
+
+# Colunares por versão do quadro, e indicadores por (versão, filtro)
+_frame_cache = TTLCache(max_entries=4)
+_analytics_cache = TTLCache(max_entries=64)
+
+@dataclass(frozen=True)
+class TaskAnalytics:
+    """
+    Indicadores de um conjunto de tarefas. Os DataFrames são compartilhados entre
+    sessões e não devem ser alterados por quem os lê.
+    - by_process / by_task_name: concluídas, pendentes, vencidas e percentis do tempo de ciclo (horas);
+    - throughput_by_process / throughput_by_task_name: conclusões por dia (linhas) e grupo (colunas).
+    """
+    total: int = 0
+    completed: int = 0
+    pending: int = 0
+    overdue: int = 0
+    cycle_time_hours: dict = field(default_factory=dict)
+    by_process: pd.DataFrame = field(default_factory=pd.DataFrame)
+    by_task_name: pd.DataFrame = field(default_factory=pd.DataFrame)
+    throughput_by_process: pd.DataFrame = field(default_factory=pd.DataFrame)
+    throughput_by_task_name: pd.DataFrame = field(default_factory=pd.DataFrame)
+    computed_at: float = 0.0
+
+def tasks_frame(board: Board) -> pd.DataFrame:
+    """Converte as tarefas do quadro em colunas (datas em UTC, nomes como categorias)."""
+    records = board.records
+    closed_ids = {p['id'] for p in board.processes if p.get('status') == 'closed'}
+    count = len(records)
+    return pd.DataFrame({
+        'process_identifier': pd.Categorical([r.process_identifier for r in records]),
+        'task_name': pd.Categorical([r.task_name or '' for r in records]),
+        'created_at': pd.to_datetime([r.created_at for r in records], utc=True),
+        'completion_date': pd.to_datetime([r.completion_date for r in records], utc=True),
+        'due_date': pd.to_datetime([r.due_date for r in records], utc=True),
+        'is_completed': np.fromiter((r.is_completed for r in records), dtype=bool, count=count),
+        'closed': np.fromiter((r.process_id in closed_ids for r in records), dtype=bool, count=count),
+    })
+
+def _percentile_columns(grouped_hours) -> pd.DataFrame:
+    percentiles = grouped_hours.quantile(list(CYCLE_TIME_PERCENTILES)).unstack()
+    percentiles.columns = [f"p{round(q * 100)}_horas" for q in percentiles.columns]
+    return percentiles.round(1)
+
+def _summary(data: pd.DataFrame, key: str) -> pd.DataFrame:
+    grouped = data.groupby(key, observed=True)
+    summary = grouped.agg(concluidas=('is_completed', 'sum'), pendentes=('pending', 'sum'), vencidas=('overdue', 'sum'))
+    return summary.join(_percentile_columns(grouped['cycle_hours']))
+
+def _throughput(data: pd.DataFrame, key: str, days: pd.Series, since: pd.Timestamp, index: pd.DatetimeIndex) -> pd.DataFrame:
+    mask = data['is_completed'].to_numpy() & (days >= since).to_numpy()
+    counts = pd.crosstab(days[mask], data.loc[mask, key].astype(str))
+    return counts.reindex(index, fill_value=0)
+
+def compute_analytics(frame: pd.DataFrame, now: pd.Timestamp | None = None) -> TaskAnalytics:
+    """
+    Calcula os indicadores de uma só vez sobre as colunas: tempo de ciclo das
+    concluídas, pendentes vencidas (vencimento anterior a `now`) e conclusões por
+    dia no horário de São Paulo, por processo e por nome de tarefa.
+    As datas de vencimento só são guardadas para tarefas pendentes, por isso o
+    atraso é medido apenas nelas.
+    """
+    now = now if now is not None else pd.Timestamp.now(tz='UTC')
+    if frame.empty:
+        return TaskAnalytics(computed_at=time.time())
+    pending = ~frame['is_completed']
+    data = frame.assign(
+        pending=pending,
+        overdue=pending & (frame['due_date'] < now),
+        cycle_hours=(frame['completion_date'] - frame['created_at']).dt.total_seconds() / 3600,
+    )
+
+    completion_days = data['completion_date'].dt.tz_convert(SAO_PAULO_TZ.key).dt.normalize()
+    today = now.tz_convert(SAO_PAULO_TZ.key).normalize()
+    since = today - pd.Timedelta(days=THROUGHPUT_DAYS - 1)
+    index = pd.date_range(since, today, freq='D')
+
+    percentiles = data['cycle_hours'].quantile(list(CYCLE_TIME_PERCENTILES))
+    return TaskAnalytics(
+        total=len(data),
+        completed=int(data['is_completed'].sum()),
+        pending=int(pending.sum()),
+        overdue=int(data['overdue'].sum()),
+        cycle_time_hours={f"p{round(q * 100)}": round(float(value), 1) for q, value in percentiles.items() if not np.isnan(value)},
+        by_process=_summary(data, 'process_identifier'),
+        by_task_name=_summary(data, 'task_name'),
+        throughput_by_process=_throughput(data, 'process_identifier', completion_days, since, index),
+        throughput_by_task_name=_throughput(data, 'task_name', completion_days, since, index),
+        computed_at=time.time(),
+    )
+
+def get_analytics(version: int, board: Board, process_identifier: str | None = None, include_closed: bool = False) -> TaskAnalytics:
+    """
+    Indicadores das tarefas do quadro (de todos os processos ou de `process_identifier`),
+    calculados uma vez por versão do quadro e filtro e compartilhados entre sessões.
+    """
+    def load():
+        frame = _frame_cache.get_or_load(version, lambda: tasks_frame(board), math.inf)
+        if process_identifier is not None:
+            frame = frame[frame['process_identifier'] == process_identifier]
+        elif not include_closed:
+            frame = frame[~frame['closed']]
+        return compute_analytics(frame)
+
+    return _analytics_cache.get_or_load((version, process_identifier, include_closed), load, ANALYTICS_TTL)
@@ -0,0 +1,102 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from rate_limiter import PRIORITY_NORMAL
+
+# Tempo de vida (segundos) de cada tipo de recurso no cache compartilhado
+TTL_PROCESSES = 30
+TTL_HISTORY = 15
+TTL_TASK = 60
+TTL_BPMN_TEMPLATE = 3600
+
+# Número máximo de respostas mantidas no cache (as menos usadas são descartadas)
+DEFAULT_MAX_ENTRIES = 2048
+
+class TTLCache:
+    """
+    Cache em memória com tempo de vida por entrada e descarte LRU ao atingir
+    `max_entries`. Chamadas simultâneas para a mesma chave são agrupadas: apenas
+    uma executa o `loader`, e as demais aguardam o mesmo resultado.
+    Falhas não são armazenadas; a exceção é repassada a todos que aguardavam.
+    Os valores são compartilhados entre sessões e não devem ser alterados por quem os lê.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0}
+
+    def get_or_load(self, key, loader, ttl: float):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry[1]
+            future = self._inflight.get(key)
+            if future:
+                self._stats['coalesced'] += 1
+                leader = False
+            else:
+                future = self._inflight[key] = Future()
+                self._stats['misses'] += 1
+                leader = True
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = loader()
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._inflight[key]
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+        future.set_result(value)
+        return value
+
+    def invalidate(self, key=None):
+        """Remove uma entrada do cache, ou todas se `key` não for informada."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, size=len(self._entries))
+
+# Cache compartilhado entre todas as sessões do processo do servidor
+shared_cache = TTLCache()
+
+def request_key(api_token: str, url: str, method: str = 'GET', payload: dict | None = None) -> tuple:
+    """Chave de uma chamada à API no cache compartilhado."""
+    return (api_token, method.upper(), url, json.dumps(payload, sort_keys=True) if payload is not None else None)
+
+def cached_request_json(client, url: str, ttl: float, method: str = 'GET', payload: dict | None = None,
+                        idempotent: bool | None = None, on_miss=None, priority: int = PRIORITY_NORMAL):
+    """
+    Executa `client.request_json` através do cache compartilhado.
+    `on_miss`, se informado, é chamado apenas quando a chamada vai de fato à API.
+    `priority` é a classe de prioridade da chamada no limitador (veja rate_limiter).
+    """
+    key = request_key(client.api_token, url, method=method, payload=payload)
+
+    def loader():
+        if on_miss: on_miss()
+        return client.request_json(url, method=method, payload=payload, idempotent=idempotent, priority=priority)
+
+    return shared_cache.get_or_load(key, loader, ttl)
@@ -1,11 +1,16 @@
 import streamlit as st
-import requests
 import os
 from dotenv import load_dotenv
 import base64
 import json
 import unicodedata
 import re
+import time
+
+# --- Carregando Variáveis de Ambiente ---
+# Antes dos módulos locais, que leem as configurações do .env ao serem importados
+load_dotenv()
+
 from auth import (
     create_user, 
     login_user, 
@@ -13,38 +18,165 @@ from auth import (
     change_password,
     get_all_users,
     get_user_details,
-    update_user_by_admin
+    update_user_by_admin,
+    issue_session_token,
+    validate_session_token,
+    revoke_session_token
 )
+from holmes_api import API_BASE_URL, endpoint_key, get_client
+from api_cache import cached_request_json, request_key, shared_cache, TTL_BPMN_TEMPLATE
+from task_board import PROCESSES_URL, DEFAULT_MAX_WORKERS
+from board_refresher import get_refresher, DEFAULT_REFRESH_SECONDS
+from task_store import init_store
+from instance_index import init_index, ensure_synced, search_instances, SEARCH_LIMIT
+from board import Board, PENDING, COMPLETED
+from analytics import get_analytics, THROUGHPUT_DAYS
+from timestamps import format_timestamp
+from bpmn_mapping import get_name_mapping, element_states
+from assets import load_asset, render_bpmn_component, render_bpmn_state_message
+from instrumentation import PhaseTimer, log_event
+from rate_limiter import shared_limiter, PRIORITY_INTERACTIVE
 
 # --- Configuração da Página e Inicialização do DB ---
 st.set_page_config(page_title="Acompanhamento de Tarefas", page_icon="📋", layout="wide")
 init_db()
+init_store()
+init_index()
 
-# --- Carregando Variáveis de Ambiente ---
-load_dotenv()
+# --- Token da API ---
 API_TOKEN = os.getenv('API_TOKEN')
 if not API_TOKEN:
     st.error('⚠️ API_TOKEN não encontrado no ficheiro .env! A aplicação não poderá buscar dados das tarefas.')
     st.stop()
+BOARD_MAX_WORKERS = int(os.getenv('BOARD_MAX_WORKERS', DEFAULT_MAX_WORKERS))
+BOARD_REFRESH_SECONDS = int(os.getenv('BOARD_REFRESH_SECONDS', DEFAULT_REFRESH_SECONDS))
+# Arquivo SQLite compartilhado pelos processos do servidor (réplicas): só um deles monta o quadro
+BOARD_SHARED_DB = os.getenv('BOARD_SHARED_DB') or None
+# Idade (segundos) a partir da qual os dados exibidos são sinalizados como desatualizados
+BOARD_MAX_STALENESS_SECONDS = int(os.getenv('BOARD_MAX_STALENESS_SECONDS', 5 * BOARD_REFRESH_SECONDS))
+# Intervalo com que cada sessão verifica se há uma nova versão do quadro (sem rerun)
+BOARD_VERSION_POLL_SECONDS = 5
+# Tempo máximo (segundos) que o botão 🔄 e o início de um processo aguardam a nova montagem;
+# se ela demorar mais, `watch_board_version` exibe a nova versão quando for publicada
+BOARD_REFRESH_WAIT_SECONDS = 3
+# Quantidade de cards exibidos por coluna a cada "Carregar mais"
+CARDS_PAGE_SIZE = int(os.getenv('CARDS_PAGE_SIZE', 50))
+# Limite opcional de cards na coluna de concluídas (0 = sem limite)
+COMPLETED_CARDS_CAP = int(os.getenv('COMPLETED_CARDS_CAP', 0))
+# Parâmetro da URL que guarda o token de sessão (recarregar a página não exige novo login)
+SESSION_QUERY_PARAM = "session"
+# Origem do bpmn-js no componente BPMN: 'cdn' (unpkg) ou 'local' (cópia em ./static)
+BPMN_JS_SOURCE = os.getenv('BPMN_JS_SOURCE', 'cdn')
 
 # --- Funções Utilitárias ---
-def format_date(date_string, include_time=True):
-    if not date_string: return 'Data não disponível'
-    try:
-        from datetime import datetime, timedelta
-        dt_utc = datetime.fromisoformat(date_string.replace('Z', '+00:00'))
-        sao_paulo_offset = timedelta(hours=-3)
-        dt_sao_paulo = dt_utc + sao_paulo_offset
-        return dt_sao_paulo.strftime('%d/%m/%Y - %H:%M') if include_time else dt_sao_paulo.strftime('%d/%m/%Y')
-    except Exception:
-        return date_string
+def format_date(dt, include_time=True):
+    if not dt: return 'Data não disponível'
+    return format_timestamp(dt, include_time)
 
 def load_file_content(file_name):
-    try:
-        with open(file_name, "r", encoding="utf-8") as f: return f.read()
-    except FileNotFoundError:
+    content = load_asset(file_name)
+    if content is None:
         st.error(f"Erro: Ficheiro '{file_name}' não encontrado.")
         return ""
+    return content
+
+@st.fragment(run_every=BOARD_VERSION_POLL_SECONDS)
+def watch_board_version(refresher, version):
+    """
+    Verifica periodicamente se o worker publicou uma nova versão do quadro e,
+    só nesse caso, executa novamente o script inteiro.
+    """
+    if refresher.current_version() != version:
+        st.rerun()
+
+def bpmn_state_changes(process_id, task_states):
+    """
+    Compara o estado dos elementos ({id: estado}) com o último enviado ao diagrama
+    nesta sessão e retorna a mensagem com apenas as mudanças (None se nada mudou).
+    """
+    key = f"bpmn_task_states_{process_id}"
+    previous = st.session_state.get(key)
+    changes = {element_id: state for element_id, state in task_states.items() if (previous or {}).get(element_id) != state}
+    changes.update({element_id: None for element_id in (previous or {}) if element_id not in task_states})
+    st.session_state[key] = task_states
+    if previous is not None and not changes:
+        return None
+    st.session_state.bpmn_message_seq = st.session_state.get('bpmn_message_seq', 0) + 1
+    return {"processId": process_id, "changes": changes, "reset": previous is None, "seq": st.session_state.bpmn_message_seq}
+
+# --- Cards do Kanban ---
+def pending_card_html(task):
+    caption_parts = [
+        f"📁 {task.process_identifier or 'N/A'}",
+        f"📅 {format_date(task.created_at)}"
+    ]
+    # Adiciona a data de vencimento apenas se ela existir
+    if task.due_date:
+        caption_parts.append(f"🎯 {format_date(task.due_date, include_time=False)}")
+    if task.stale:
+        caption_parts.append("⚠️ desatualizada")
+    card_caption = " | ".join(caption_parts)
+    long_link, task_name = task.long_link or '#', task.task_name or 'Tarefa sem nome'
+    return (f'<a href="{long_link}" target="_blank" class="card-link-wrapper">'
+            f'<div class="custom-card pending-card"><div class="card-title">{task_name}</div>'
+            f'<div class="card-caption">{card_caption}</div></div></a>')
+
+def completed_card_html(task):
+    caption_parts = [
+        f"📁 {task.process_identifier}",
+        f"📅 {format_date(task.created_at)}",
+        f"✅ {format_date(task.completion_date)}"
+    ]
+    card_caption = " | ".join(caption_parts)
+    task_name = task.task_name
+    return (f'<div class="custom-card completed-card"><div class="card-title">{task_name}</div>'
+            f'<div class="card-caption">{card_caption}</div></div>')
+
+def show_card_column(tasks, card_html, state_key, cap=0):
+    """
+    Renderiza os cards de uma coluna em um único `st.markdown`, exibindo apenas
+    os primeiros `st.session_state[state_key]` cards e um botão "Carregar mais".
+    Com `cap`, no máximo `cap` cards podem ser exibidos.
+    """
+    total = len(tasks)
+    if cap: tasks = tasks[:cap]
+    visible = st.session_state.get(state_key, CARDS_PAGE_SIZE)
+    if tasks:
+        # A coluna começa com um <div> em linha própria e não tem linhas em branco: assim o
+        # Markdown (CommonMark) a trata inteira como um só bloco HTML, sem reinterpretar os cards
+        cards = "\n".join(card_html(task) for task in tasks[:visible])
+        st.markdown(f'<div class="card-column">\n{cards}\n</div>', unsafe_allow_html=True)
+    if visible < len(tasks):
+        if st.button(f"Carregar mais ({len(tasks) - visible} restantes)", key=f"{state_key}_more", use_container_width=True):
+            st.session_state[state_key] = visible + CARDS_PAGE_SIZE
+            st.rerun()
+    elif len(tasks) < total:
+        st.caption(f"Exibindo as {len(tasks)} tarefas mais recentes de {total}.")
+
+# --- Painel de Desempenho ---
+def show_performance_panel(timer, refresher, snapshot):
+    """Painel (somente administradores) com os tempos desta renderização, as requisições e o cache."""
+    with st.sidebar.expander("⏱️ Desempenho", expanded=False):
+        st.markdown(f"**Renderização:** {timer.total() * 1000:.0f} ms")
+        st.dataframe([{'fase': name, 'ms': round(seconds * 1000, 1)} for name, seconds in timer.phases.items()], hide_index=True, use_container_width=True)
+        if timer.requests:
+            st.markdown("**Requisições nesta renderização**")
+            st.dataframe([{'endpoint': endpoint, 'chamadas': m['requests'], 'erros': m['errors'], 'média (ms)': round(m['total_time'] / m['requests'] * 1000, 1), 'máx (ms)': round(m['max_time'] * 1000, 1)} for endpoint, m in timer.requests.items()], hide_index=True, use_container_width=True)
+        client_metrics = get_client(API_TOKEN).metrics()
+        if client_metrics:
+            st.markdown("**API (acumulado do servidor)**")
+            st.dataframe([{'endpoint': endpoint, 'chamadas': m['requests'], 'erros': m['errors'], 'retries': m['retries'], 'média (ms)': round(m['avg_time'] * 1000, 1), 'máx (ms)': round(m['max_time'] * 1000, 1)} for endpoint, m in sorted(client_metrics.items())], hide_index=True, use_container_width=True)
+        cache_stats = shared_cache.stats()
+        lookups = cache_stats['hits'] + cache_stats['misses']
+        hit_rate = f"{cache_stats['hits'] / lookups:.0%}" if lookups else "-"
+        limiter_stats = shared_limiter.stats()
+        st.markdown(f"**Limitador:** {limiter_stats['granted']} liberadas, {limiter_stats['waited']} aguardaram ({limiter_stats['wait_time']:.1f} s no total), {limiter_stats['rejected']} recusadas, {limiter_stats['throttled']} respostas 429")
+        st.markdown(f"**Cache:** {hit_rate} de acertos ({cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['coalesced']} agrupadas, {cache_stats['size']} entradas)")
+        if BOARD_SHARED_DB:
+            st.markdown(f"**Snapshot compartilhado:** {'líder' if refresher.is_leader else 'seguidor'} ({refresher.owner})")
+        if snapshot:
+            st.markdown(f"**Última montagem do quadro** (versão {snapshot.version}, há {time.time() - snapshot.built_at:.0f} s)")
+            st.json(snapshot.stats)
 
 # --- Lógica de Login (sem registro público) ---
 def show_login_page():
@@ -63,6 +195,8 @@ def show_login_page():
                 st.session_state.logged_in = True
                 st.session_state.username = username
                 st.session_state.user_role = user_role
+                token = issue_session_token(username)
+                if token: st.query_params[SESSION_QUERY_PARAM] = token
                 st.rerun()
             else:
                 st.error("Usuário ou senha inválidos.")
@@ -72,6 +206,9 @@ def show_main_app():
     st.sidebar.title(f"Bem-vindo(a), {st.session_state.username}!")
     st.sidebar.markdown(f"**Cargo:** `{st.session_state.user_role}`")
     if st.sidebar.button("Logout"):
+        if SESSION_QUERY_PARAM in st.query_params:
+            revoke_session_token(st.query_params[SESSION_QUERY_PARAM])
+            del st.query_params[SESSION_QUERY_PARAM]
         for key in list(st.session_state.keys()):
             del st.session_state[key]
         st.rerun()
@@ -92,6 +229,9 @@ def show_main_app():
                 else:
                     success = change_password(st.session_state.username, current_password, new_password)
                     if success:
+                        # A troca de senha revoga os tokens emitidos; esta sessão recebe um novo
+                        token = issue_session_token(st.session_state.username)
+                        if token: st.query_params[SESSION_QUERY_PARAM] = token
                         st.success("Senha alterada com sucesso!")
                     else:
                         st.error("A senha atual está incorreta.")
@@ -163,35 +303,35 @@ def show_main_app():
     # --- O RESTANTE DO SEU CÓDIGO DA APLICAÇÃO ---
     PROCESS_NAME_TO_FILTER = "Auditoria BIM"
     
-    def fetch_data(url, method='GET', payload=None):
-        headers = {'api_token': API_TOKEN}
+    timer = PhaseTimer()
+
+    def fetch_data(url, method='GET', payload=None, idempotent=None, ttl=None, priority=PRIORITY_INTERACTIVE):
+        start = time.perf_counter()
         try:
-            if method.upper() == 'POST':
-                headers['Content-Type'] = 'application/json'
-                response = requests.post(url, headers=headers, json=payload)
+            if ttl:
+                data = cached_request_json(get_client(API_TOKEN), url, ttl, method=method, payload=payload, idempotent=idempotent, priority=priority)
             else:
-                response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            return response.json()
+                data = get_client(API_TOKEN).request_json(url, method=method, payload=payload, idempotent=idempotent, priority=priority)
+            timer.record_request(f"{method} {endpoint_key(url)}", time.perf_counter() - start)
+            return data
         except Exception as e:
+            timer.record_request(f"{method} {endpoint_key(url)}", time.perf_counter() - start, ok=False)
             if 'tasks' not in url: st.error(f"Erro ao buscar dados de {url}: {e}")
             return None
             
     def fetch_bpmn_xml(process_id):
-        return fetch_data(f"https://app-api.holmesdoc.io/v1/admin/processes/{process_id}/troubleshooting/template")
-
-    @st.cache_data(ttl=600)
-    def fetch_instances_for_dropdown():
-        instance_data_url = "https://app-api.holmesdoc.io/v1/entities/68597a8e0b52b4fa33e34995/instances/search"
-        search_payload = {"query": {"from": 0, "size": 200, "order": "asc", "groups": [{"match_all": True, "terms": [{"field": "entity_id", "type": "is", "value": "68597a8e0b52b4fa33e34995"}]}],"sort": "8547a640-504b-11f0-a2c8-75d9e0938171"}}
-        data = fetch_data(instance_data_url, method='POST', payload=search_payload)
-        instance_map = {}
-        if data and 'docs' in data:
-            for doc in data['docs']:
-                if doc.get('props') and len(doc['props']) > 0 and 'value' in doc['props'][0]:
-                    display_name, instance_id = doc['props'][0]['value'], doc.get('instance_id')
-                    if display_name and instance_id: instance_map[display_name] = instance_id
-        return instance_map
+        return fetch_data(f"{API_BASE_URL}/admin/processes/{process_id}/troubleshooting/template", ttl=TTL_BPMN_TEMPLATE)
+
+    INSTANCES_ENTITY_ID = "68597a8e0b52b4fa33e34995"
+    INSTANCES_SORT_FIELD = "8547a640-504b-11f0-a2c8-75d9e0938171"
+
+    def fetch_instances_for_dropdown(query):
+        # As instâncias vêm do índice local, sincronizado por completo (todas as páginas) em segundo plano
+        try:
+            ensure_synced(API_TOKEN, INSTANCES_ENTITY_ID, INSTANCES_SORT_FIELD)
+        except Exception as e:
+            st.error(f"Erro ao buscar dados de {API_BASE_URL}/entities/{INSTANCES_ENTITY_ID}/instances/search: {e}")
+        return search_instances(INSTANCES_ENTITY_ID, query)
 
     st.markdown(f"<style>{load_file_content('styles.css')}</style>", unsafe_allow_html=True)
     st.title('📋 Acompanhamento de Tarefas - Auditoria BIM')
@@ -203,40 +343,42 @@ def show_main_app():
         st.success(st.session_state.creation_success_message)
         st.session_state.creation_success_message = None
 
-    API_URL = 'https://app-api.holmesdoc.io/v1/processes/'
-    WORKFLOW_START_URL = "https://app-api.holmesdoc.io/v1/workflows/684b215594374c145b750317/start"
+    WORKFLOW_START_URL = f"{API_BASE_URL}/workflows/684b215594374c145b750317/start"
 
     with st.container():
         st.markdown('<div class="controls-wrapper">', unsafe_allow_html=True)
         with st.container():
-            processes_data = fetch_data(API_URL)
-            processes_base = processes_data.get('processes', []) if processes_data else []
-            if PROCESS_NAME_TO_FILTER:
-                processes_base = [p for p in processes_base if p.get('name') == PROCESS_NAME_TO_FILTER]
+            # O quadro é montado por um worker em segundo plano, compartilhado por todas as sessões
+            refresher = get_refresher(API_TOKEN, PROCESS_NAME_TO_FILTER, interval=BOARD_REFRESH_SECONDS, max_workers=BOARD_MAX_WORKERS, shared_db=BOARD_SHARED_DB)
+            with st.spinner("Carregando tarefas..."), timer.phase('snapshot'):
+                snapshot = refresher.wait_for_snapshot()
+            if refresher.last_error:
+                st.error(f"Erro ao buscar dados de {PROCESSES_URL}: {refresher.last_error}")
+            if snapshot and time.time() - snapshot.built_at > BOARD_MAX_STALENESS_SECONDS:
+                st.warning(f"⚠️ Os dados exibidos foram atualizados há {(time.time() - snapshot.built_at) / 60:.0f} minutos.")
+            board = snapshot.board if snapshot else Board()
 
             filter_col, refresh_col, check_col, create_col = st.columns([6, 1, 2, 3])
             
             with check_col:
                 include_closed = st.checkbox("Incluir", value=False, help="Incluir processos concluídos")
-            
-            if not include_closed:
-                processes = [p for p in processes_base if p.get('status') != 'closed']
-            else:
-                processes = processes_base
-            processes = [p for p in processes if p.get('status') != 'canceled']
 
             with filter_col:
-                all_identifiers = sorted(list(set(p['identifier'] for p in processes)))
-                filter_options = ["Todos os processos"] + all_identifiers
+                filter_options = ["Todos os processos", *board.process_identifiers(include_closed)]
                 selected_process = st.selectbox("Filtrar por processo:", options=filter_options, label_visibility="collapsed")
                 
             with refresh_col:
                 if st.button("🔄", help="Atualizar dados"):
+                    with st.spinner("Atualizando..."):
+                        refresher.refresh_now(timeout=BOARD_REFRESH_WAIT_SECONDS)
                     st.rerun()
 
             with create_col:
                 with st.popover("➕ Criar"):
-                    instance_map = fetch_instances_for_dropdown()
+                    instance_query = st.text_input("Buscar instância", placeholder="Digite o início do nome")
+                    instance_map = fetch_instances_for_dropdown(instance_query)
+                    if len(instance_map) >= SEARCH_LIMIT:
+                        st.caption(f"Exibindo as primeiras {SEARCH_LIMIT} instâncias; digite mais letras para refinar a busca.")
                     with st.form("new_process_form_popover"):
                         st.write("Preencha os dados para iniciar um novo processo.")
                         prop_value_1 = st.text_input("Disciplina")
@@ -252,103 +394,41 @@ def show_main_app():
                                 response = fetch_data(WORKFLOW_START_URL, method='POST', payload=start_payload)
                                 if response and response.get('id'):
                                     st.session_state.creation_success_message = f"Processo iniciado com sucesso! ID: {response.get('id')}"
+                                    shared_cache.invalidate(request_key(API_TOKEN, PROCESSES_URL))
+                                    with st.spinner("Atualizando o quadro..."):
+                                        refresher.refresh_now(timeout=BOARD_REFRESH_WAIT_SECONDS)
                                     st.rerun()
                                 else:
                                     st.error("Falha ao iniciar o processo.")
         st.markdown('</div>', unsafe_allow_html=True)
 
-    process_id_map = {}
-    all_tasks = {}
-    history_payload = {"filters": [], "page": 1, "per_page": 100, "sortBy": ["created_at", "asc"]}
-
-    for process in processes:
-        process_id = process.get('id')
-        process_identifier = process.get('identifier')
-        if not process_id or not process_identifier: continue
-        process_id_map[process_identifier] = process_id
-        history_response = fetch_data(f"https://app-api.holmesdoc.io/v1/processes/{process_id}/history", method='POST', payload=history_payload)
-        if not history_response: continue
-        for hist in history_response.get('histories', []):
-            props = hist.get('properties', {})
-            task_id = props.get('task_id')
-            if task_id and props.get('long_link'):
-                if task_id not in all_tasks:
-                    all_tasks[task_id] = {'process_id': process_id, 'process_identifier': process_identifier, 'task_name': props.get('task_name'), 'long_link': props.get('long_link'), 'task_id': task_id, 'created_at': hist.get('created_at', '')}
-
-    for process in processes:
-        process_id = process.get('id')
-        if not process_id: continue
-        history_response = fetch_data(f"https://app-api.holmesdoc.io/v1/processes/{process_id}/history", method='POST', payload=history_payload)
-        if not history_response: continue
-        for hist in history_response.get('histories', []):
-            if hist.get('key') == 'history.take_action':
-                props = hist.get('properties', {})
-                task_id = props.get('task_id')
-                if task_id in all_tasks:
-                    completion_date = hist.get('created_at')
-                    current_completion = all_tasks[task_id].get('completion_date')
-                    if not current_completion or completion_date > current_completion:
-                        all_tasks[task_id]['is_completed'] = True
-                        all_tasks[task_id]['completion_date'] = completion_date
-
-    for task_id, task_details in all_tasks.items():
-        if not task_details.get('is_completed'):
-            task_api_data = fetch_data(f"https://app-api.holmesdoc.io/v1/tasks/{task_id}")
-            if task_api_data and task_api_data.get('due_date'):
-                task_details['due_date'] = task_api_data.get('due_date')
-
-    all_tasks_list_final = sorted(list(all_tasks.values()), key=lambda x: x['created_at'], reverse=True)
-    pending_tasks = [task for task in all_tasks_list_final if not task.get('is_completed')]
-    completed_tasks = [task for task in all_tasks_list_final if task.get('is_completed')]
-
-    display_pending = [t for t in pending_tasks if selected_process == "Todos os processos" or t['process_identifier'] == selected_process]
-    display_completed = [t for t in completed_tasks if selected_process == "Todos os processos" or t['process_identifier'] == selected_process]
+    if snapshot:
+        for url, e in snapshot.errors:
+            if 'tasks' not in url: st.error(f"Erro ao buscar dados de {url}: {e}")
+        st.sidebar.caption(f"🔁 Requisições de histórico na última atualização: {snapshot.stats['history_requests']}")
+        if snapshot.stats.get('stale_tasks'):
+            st.warning(f"⚠️ {snapshot.stats['stale_tasks']} tarefa(s) com dados desatualizados: a API não respondeu ou o limite de chamadas foi atingido. Elas serão atualizadas nas próximas montagens do quadro.")
+
+    with timer.phase('filter'):
+        # Consultas aos índices do quadro, sem reordenar nem percorrer todas as tarefas
+        process_filter = None if selected_process == "Todos os processos" else selected_process
+        display_pending = board.tasks(PENDING, process_filter, include_closed)
+        display_completed = board.tasks(COMPLETED, process_filter, include_closed)
+
+    # A janela de cards visíveis volta ao início quando o filtro muda
+    if st.session_state.get('board_filter') != selected_process:
+        st.session_state.board_filter = selected_process
+        st.session_state.pending_visible = CARDS_PAGE_SIZE
+        st.session_state.completed_visible = CARDS_PAGE_SIZE
 
     col_pending, col_completed = st.columns(2)
-    with col_pending:
+    with col_pending, timer.phase('cards'):
         st.markdown(f'<div class="kanban-header kanban-header-pending">⏳ PENDENTE ({len(display_pending)})</div>', unsafe_allow_html=True)
-        for task in display_pending:
-            # CORREÇÃO: Lógica para montar o caption
-            caption_parts = [
-                f"📁 {task.get('process_identifier', 'N/A')}",
-                f"📅 {format_date(task.get('created_at'))}"
-            ]
-            
-            # Adiciona a data de vencimento apenas se ela existir
-            if task.get('due_date'):
-                due_date_formatted = format_date(task.get('due_date'), include_time=False)
-                caption_parts.append(f"🎯 {due_date_formatted}")
+        show_card_column(display_pending, pending_card_html, 'pending_visible')
 
-            card_caption = " | ".join(caption_parts)
-            
-            card_html = f"""
-            <a href="{task.get('long_link', '#')}" target="_blank" class="card-link-wrapper">
-                <div class="custom-card pending-card">
-                    <div class="card-title">{task.get('task_name', 'Tarefa sem nome')}</div>
-                    <div class="card-caption">{card_caption}</div>
-                </div>
-            </a>
-            """
-            st.markdown(card_html, unsafe_allow_html=True)
-
-    with col_completed:
+    with col_completed, timer.phase('cards'):
         st.markdown(f'<div class="kanban-header kanban-header-completed">✅ CONCLUÍDA ({len(display_completed)})</div>', unsafe_allow_html=True)
-        for task in display_completed:
-            creation_date_formatted = format_date(task.get('created_at', ''))
-            completion_date_formatted = format_date(task.get('completion_date', ''))
-            caption_parts = [
-                f"📁 {task['process_identifier']}",
-                f"📅 {creation_date_formatted}",
-                f"✅ {completion_date_formatted}"
-            ]
-            card_caption = " | ".join(caption_parts)
-            card_html = f"""
-            <div class="custom-card completed-card">
-                <div class="card-title">{task['task_name']}</div>
-                <div class="card-caption">{card_caption}</div>
-            </div>
-            """
-            st.markdown(card_html, unsafe_allow_html=True)
+        show_card_column(display_completed, completed_card_html, 'completed_visible', cap=COMPLETED_CARDS_CAP)
 
     st.markdown("---")
     m_col1, m_col2, m_col3 = st.columns(3)
@@ -357,33 +437,85 @@ def show_main_app():
     with m_col2: st.metric("⏳ Pendentes", len(display_pending))
     with m_col3: st.metric("✅ Concluídas", len(display_completed))
 
-    js_data, bpmn_container_html = {}, ""
+    with st.expander("📈 Indicadores", expanded=False), timer.phase('analytics'):
+        # Calculados uma vez por versão do quadro e filtro, e compartilhados entre sessões
+        analytics = get_analytics(snapshot.version if snapshot else 0, board, process_filter, include_closed)
+        a_col1, a_col2, a_col3, a_col4 = st.columns(4)
+        with a_col1: st.metric("⏱️ Tempo de ciclo (mediana)", f"{analytics.cycle_time_hours['p50']:.1f} h" if 'p50' in analytics.cycle_time_hours else "-")
+        with a_col2: st.metric("⏱️ Tempo de ciclo (p90)", f"{analytics.cycle_time_hours['p90']:.1f} h" if 'p90' in analytics.cycle_time_hours else "-")
+        with a_col3: st.metric("🚨 Pendentes vencidas", analytics.overdue)
+        with a_col4: st.metric(f"📦 Concluídas ({THROUGHPUT_DAYS} dias)", int(analytics.throughput_by_task_name.to_numpy().sum()) if not analytics.throughput_by_task_name.empty else 0)
+        if not analytics.throughput_by_task_name.empty:
+            st.markdown(f"**Conclusões por dia (últimos {THROUGHPUT_DAYS} dias)**")
+            st.bar_chart(analytics.throughput_by_task_name)
+        if not analytics.by_task_name.empty:
+            st.markdown("**Por tarefa**")
+            st.dataframe(analytics.by_task_name, use_container_width=True)
+        if process_filter is None and not analytics.by_process.empty:
+            st.markdown("**Por processo**")
+            st.dataframe(analytics.by_process, use_container_width=True)
+
+    js_data = {}
     if selected_process != "Todos os processos":
         st.markdown("---")
         st.markdown(f"### 🔄 Diagrama BPMN para: **{selected_process}**")
-        selected_process_id = process_id_map.get(selected_process)
+        selected_process_id = board.process_id(selected_process)
         if selected_process_id:
-            xml_data = fetch_bpmn_xml(selected_process_id)
+            with timer.phase('bpmn_template'):
+                xml_data = fetch_bpmn_xml(selected_process_id)
             if xml_data and xml_data.get('xml'):
                 xml_content = xml_data.get('xml')
                 xml_b64 = base64.b64encode(xml_content.encode('utf-8')).decode('utf-8')
-                js_data = {"xmlB64": xml_b64, "completedTasks": [t['task_name'] for t in display_completed], "pendingTasks": [t['task_name'] for t in display_pending]}
-                bpmn_container_html = load_file_content('bpmn_container.html')
+                # O HTML do diagrama depende só do XML, para que o iframe não seja recriado
+                # (nem o diagrama reimportado) quando apenas o estado das tarefas muda.
+                js_data = {"xmlB64": xml_b64, "processId": selected_process_id}
             else:
                 st.warning(f"⚠️ Não foi possível carregar o diagrama BPMN para o processo **{selected_process}**.")
     else:
         st.info("🔍 **Selecione um processo específico** no filtro acima para visualizar seu diagrama BPMN.")
 
-    main_js = load_file_content('main.js')
-    if bpmn_container_html and main_js:
-        js_data_script = f'<script>window.bpmnData = {json.dumps(js_data)};</script>'
-        final_html = f"""<!DOCTYPE html><html lang="pt-BR"><head><meta charset="UTF-8"><title>Componente BPMN</title><style>{load_file_content('styles.css')}</style><script src="https://unpkg.com/bpmn-js@17.0.2/dist/bpmn-navigated-viewer.production.min.js"></script></head><body>{bpmn_container_html}{js_data_script}<script>{main_js}</script></body></html>"""
-        st.components.v1.html(final_html, height=510)
+    if js_data:
+        with timer.phase('bpmn'):
+            final_html = render_bpmn_component(json.dumps(js_data), bpmn_js_source=BPMN_JS_SOURCE)
+            if final_html:
+                st.components.v1.html(final_html, height=510)
+            else:
+                st.error("Erro: Ficheiros do componente BPMN não encontrados.")
+
+            # Os nomes das tarefas são resolvidos para ids de elementos no servidor,
+            # com o mapeamento do template calculado uma única vez por template
+            task_states = element_states(get_name_mapping(xml_content), [t.task_name for t in display_completed], [t.task_name for t in display_pending])
+            message = bpmn_state_changes(selected_process_id, task_states)
+            if message:
+                messenger_html = render_bpmn_state_message(json.dumps(message))
+                if messenger_html: st.components.v1.html(messenger_html, height=0)
+
+    log_event('render', user=st.session_state.username, process=selected_process, board_version=snapshot.version if snapshot else 0, pending=len(display_pending), completed=len(display_completed), total_ms=round(timer.total() * 1000, 1), phases=timer.as_dict(), requests=timer.requests)
+    if st.session_state.user_role == 'admin':
+        show_performance_panel(timer, refresher, snapshot)
+
+    watch_board_version(refresher, snapshot.version if snapshot else 0)
 
 # --- Controle de Fluxo Principal ---
 if 'logged_in' not in st.session_state:
     st.session_state.logged_in = False
 
+# O token de sessão da URL é validado a cada execução (HMAC e cache em memória, sem bcrypt):
+# recarregar a página ou abrir uma nova aba mantém o login, e uma sessão revogada
+# (logout, troca de senha ou de cargo) é encerrada também nas abas já abertas.
+session_token = st.query_params.get(SESSION_QUERY_PARAM)
+if session_token:
+    session = validate_session_token(session_token)
+    if session:
+        st.session_state.logged_in = True
+        st.session_state.username, st.session_state.user_role = session
+    else:
+        del st.query_params[SESSION_QUERY_PARAM]
+        if st.session_state.logged_in:
+            for key in list(st.session_state.keys()):
+                del st.session_state[key]
+            st.session_state.logged_in = False
+
 if st.session_state.logged_in:
     show_main_app()
 else:
@@ -0,0 +1,90 @@
+import os
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Com ASSETS_DEV_MODE=1, os arquivos são relidos sempre que forem modificados no disco
+DEV_MODE = os.getenv('ASSETS_DEV_MODE', '0') == '1'
+
+BPMN_JS_VERSION = "17.0.2"
+BPMN_JS_CDN_URL = f"https://unpkg.com/bpmn-js@{BPMN_JS_VERSION}/dist/bpmn-navigated-viewer.production.min.js"
+# Cópia local do bpmn-js, servida pelo static file serving do Streamlit (pasta ./static)
+BPMN_JS_LOCAL_FILE = os.path.join("static", "bpmn-navigated-viewer.production.min.js")
+BPMN_JS_LOCAL_URL = "/app/static/bpmn-navigated-viewer.production.min.js"
+
+_cache = {}
+_lock = threading.Lock()
+
+def _mtime(file_name: str) -> float | None:
+    try:
+        return os.stat(file_name).st_mtime
+    except OSError:
+        return None
+
+def load_asset(file_name: str) -> str | None:
+    """
+    Retorna o conteúdo de um arquivo estático, lido do disco uma única vez.
+    Em modo de desenvolvimento, o arquivo é relido quando sua data de modificação muda.
+    Retorna None se o arquivo não existir.
+    """
+    entry = _cache.get(file_name)
+    if entry and not DEV_MODE:
+        return entry[1]
+    mtime = _mtime(file_name)
+    if entry and entry[0] == mtime:
+        return entry[1]
+    try:
+        with open(file_name, "r", encoding="utf-8") as f: content = f.read()
+    except FileNotFoundError:
+        return None
+    with _lock:
+        _cache[file_name] = (mtime, content)
+    return content
+
+def bpmn_js_url(source: str = 'cdn') -> str:
+    """
+    URL do bpmn-navigated-viewer. Com `source='local'`, usa a cópia em ./static
+    (se existir), evitando a ida ao CDN a cada carregamento do diagrama.
+    """
+    if source == 'local' and os.path.exists(BPMN_JS_LOCAL_FILE):
+        return BPMN_JS_LOCAL_URL
+    return BPMN_JS_CDN_URL
+
+def bpmn_component_template(bpmn_js_source: str = 'cdn') -> tuple[str, str] | None:
+    """
+    Retorna o HTML do componente BPMN já montado, dividido em (antes, depois) do
+    ponto onde o script com `window.bpmnData` deve ser inserido.
+    A montagem é refeita apenas quando algum dos arquivos usados é recarregado.
+    Retorna None se algum dos arquivos não existir.
+    """
+    styles, container, main_js = load_asset('styles.css'), load_asset('bpmn_container.html'), load_asset('main.js')
+    if not (styles and container and main_js):
+        return None
+    key = ('bpmn_component', bpmn_js_source) + tuple(_cache[name][0] for name in ('styles.css', 'bpmn_container.html', 'main.js'))
+    template = _cache.get(key)
+    if template is None:
+        head = f"""<!DOCTYPE html><html lang="pt-BR"><head><meta charset="UTF-8"><title>Componente BPMN</title><style>{styles}</style><script src="{bpmn_js_url(bpmn_js_source)}"></script></head><body>{container}"""
+        tail = f"""<script>{main_js}</script></body></html>"""
+        template = (head, tail)
+        with _lock:
+            # Descarta montagens feitas com versões anteriores dos arquivos
+            for old_key in [k for k in _cache if isinstance(k, tuple) and k[:2] == key[:2]]:
+                del _cache[old_key]
+            _cache[key] = template
+    return template
+
+def render_bpmn_component(js_data_json: str, bpmn_js_source: str = 'cdn') -> str | None:
+    """Insere `window.bpmnData` no HTML pré-montado do componente BPMN."""
+    template = bpmn_component_template(bpmn_js_source)
+    if template is None:
+        return None
+    head, tail = template
+    return f"{head}<script>window.bpmnData = {js_data_json};</script>{tail}"
+
+def render_bpmn_state_message(message_json: str) -> str | None:
+    """HTML do iframe invisível que envia ao componente BPMN as mudanças de estado das tarefas."""
+    messenger_js = load_asset('bpmn_messenger.js')
+    if messenger_js is None:
+        return None
+    return f"<script>window.bpmnStateMessage = {message_json};</script><script>{messenger_js}</script>"
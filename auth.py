@@ -1,21 +1,114 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
 import sqlite3
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import bcrypt
 import streamlit as st
+from dotenv import load_dotenv
 
 # Nome do arquivo do banco de dados SQLite
 DB_NAME = "auth.db"
 
+# Número máximo de conexões mantidas abertas no pool
+DB_POOL_SIZE = 4
+
+# Tempo (segundos) que a lista de usuários e os cargos ficam em cache. Escritas feitas
+# por este processo invalidam o cache na hora; o TTL limita o atraso para escritas
+# feitas por outros processos do servidor.
+USER_CACHE_TTL = 30
+
+# As configurações abaixo podem vir do .env, que precisa ser carregado antes de lê-las
+load_dotenv()
+
+# Custo (work factor) do bcrypt para novos hashes. Senhas com outro custo são
+# refeitas automaticamente no próximo login bem-sucedido.
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+
+# Número máximo de cálculos de bcrypt simultâneos. O bcrypt libera o GIL, então
+# os cálculos rodam em paralelo fora da thread do script, limitados a este pool.
+BCRYPT_POOL_SIZE = int(os.getenv('BCRYPT_POOL_SIZE', os.cpu_count() or 2))
+
+# Validade (segundos) dos tokens de sessão, que evitam um novo login (e um bcrypt) ao recarregar a página
+SESSION_TOKEN_TTL = int(os.getenv('SESSION_TOKEN_TTL', 12 * 3600))
+
+# Chave dos tokens de sessão. Se não for definida, uma chave aleatória é gerada e
+# guardada no banco, e assim compartilhada pelos processos que usam o mesmo auth.db.
+SESSION_SECRET = os.getenv('SESSION_SECRET')
+
+_pool = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+_hash_executor = ThreadPoolExecutor(max_workers=BCRYPT_POOL_SIZE, thread_name_prefix="bcrypt")
+_user_cache = {}
+_user_cache_generation = 0
+_user_cache_lock = threading.Lock()
+_session_key = None
+_revoked_tokens = {}
+_revoked_tokens_lock = threading.Lock()
+
 def get_db_connection():
     """
-    Cria e retorna um objeto de conexão com o banco de dados SQLite.
+    Cria e retorna um objeto de conexão com o banco de dados SQLite,
+    em modo WAL para que leituras não sejam bloqueadas por escritas.
     """
     try:
-        conn = sqlite3.connect(DB_NAME, check_same_thread=False)
+        conn = sqlite3.connect(DB_NAME, timeout=30, check_same_thread=False, cached_statements=64)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
         return conn
     except sqlite3.Error as e:
         st.error(f"Erro ao conectar ao banco de dados: {e}")
         return None
 
+@contextmanager
+def db_connection():
+    """
+    Empresta uma conexão do pool (criando uma nova se o pool estiver vazio) e a
+    devolve ao final. As consultas parametrizadas ficam preparadas no cache de
+    statements de cada conexão, que é reaproveitada entre chamadas e sessões.
+    Produz None se não for possível conectar.
+    """
+    try:
+        conn = _pool.get_nowait()
+    except queue.Empty:
+        conn = get_db_connection()
+    try:
+        yield conn
+    finally:
+        if conn:
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                _pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+def _cached_user_query(key, loader):
+    """Retorna o resultado em cache de uma consulta de usuários, ou executa `loader`."""
+    with _user_cache_lock:
+        entry = _user_cache.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        generation = _user_cache_generation
+    value = loader()
+    with _user_cache_lock:
+        # Não guarda o resultado se houve uma escrita durante a consulta
+        if generation == _user_cache_generation:
+            _user_cache[key] = (time.monotonic() + USER_CACHE_TTL, value)
+    return value
+
+def _invalidate_user_cache():
+    global _user_cache_generation
+    with _user_cache_lock:
+        _user_cache_generation += 1
+        _user_cache.clear()
+
 def init_db():
     """
     Inicializa o banco de dados. Cria a tabela de usuários se não existir
@@ -25,37 +118,45 @@ def init_db():
         return
 
     try:
-        conn = get_db_connection()
-        if conn:
-            cursor = conn.cursor()
-            # Cria a tabela 'users' com um campo 'role'
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS users (
-                    username TEXT PRIMARY KEY,
-                    password TEXT NOT NULL,
-                    role TEXT NOT NULL
-                )
-            """)
-            
-            # Verifica se algum usuário existe
-            cursor.execute("SELECT COUNT(*) FROM users")
-            user_count = cursor.fetchone()[0]
-
-            # Se não houver usuários, cria o admin padrão
-            if user_count == 0:
-                admin_username = "admin"
-                admin_password = "admin"
-                hashed_pw = hash_password(admin_password)
-                cursor.execute(
-                    "INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
-                    (admin_username, hashed_pw, 'admin')
-                )
-                print(f"Usuário administrador padrão '{admin_username}' com senha '{admin_password}' foi criado.")
-            
-            conn.commit()
-            conn.close()
-            st.session_state.db_initialized = True
-            print("Banco de dados SQLite inicializado com sucesso.")
+        with db_connection() as conn:
+            if conn:
+                cursor = conn.cursor()
+                # Cria a tabela 'users' com um campo 'role'
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS users (
+                        username TEXT PRIMARY KEY,
+                        password TEXT NOT NULL,
+                        role TEXT NOT NULL
+                    )
+                """)
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_role ON users (role)")
+                # Versão das sessões do usuário: incrementada para revogar os tokens já emitidos
+                columns = [row[1] for row in cursor.execute("PRAGMA table_info(users)")]
+                if 'session_version' not in columns:
+                    cursor.execute("ALTER TABLE users ADD COLUMN session_version INTEGER NOT NULL DEFAULT 0")
+                cursor.execute("CREATE TABLE IF NOT EXISTS app_secrets (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+                # Tokens de sessão revogados (logout), até o fim da sua validade
+                cursor.execute("CREATE TABLE IF NOT EXISTS revoked_tokens (jti TEXT PRIMARY KEY, expires_at REAL NOT NULL)")
+
+                # Verifica se algum usuário existe
+                cursor.execute("SELECT COUNT(*) FROM users")
+                user_count = cursor.fetchone()[0]
+
+                # Se não houver usuários, cria o admin padrão
+                if user_count == 0:
+                    admin_username = "admin"
+                    admin_password = "admin"
+                    hashed_pw = hash_password(admin_password)
+                    cursor.execute(
+                        "INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
+                        (admin_username, hashed_pw, 'admin')
+                    )
+                    print(f"Usuário administrador padrão '{admin_username}' com senha '{admin_password}' foi criado.")
+
+                conn.commit()
+                _invalidate_user_cache()
+                st.session_state.db_initialized = True
+                print("Banco de dados SQLite inicializado com sucesso.")
     except sqlite3.Error as e:
         st.error(f"Erro ao inicializar o banco de dados SQLite: {e}")
         st.stop()
@@ -63,12 +164,19 @@ def init_db():
 # --- Funções de HASH de Senha ---
 
 def hash_password(password: str) -> bytes:
-    """Gera o hash de uma senha usando bcrypt."""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    """Gera o hash de uma senha usando bcrypt, com o custo `BCRYPT_ROUNDS`."""
+    return _hash_executor.submit(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt(BCRYPT_ROUNDS)).result()
 
 def check_password(password: str, hashed_password: bytes) -> bool:
     """Verifica se a senha fornecida corresponde ao hash armazenado."""
-    return bcrypt.checkpw(password.encode('utf-8'), hashed_password)
+    return _hash_executor.submit(bcrypt.checkpw, password.encode('utf-8'), hashed_password).result()
+
+def needs_rehash(hashed_password: bytes) -> bool:
+    """Indica se o hash foi gerado com um custo diferente de `BCRYPT_ROUNDS`."""
+    try:
+        return int(hashed_password.split(b'$')[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
 
 # --- Funções de Gerenciamento de Usuário ---
 
@@ -76,93 +184,108 @@ def create_user(username: str, password: str, role: str = "user") -> bool:
     """
     Cria um novo usuário no banco de dados com um cargo específico.
     """
-    conn = get_db_connection()
-    if not conn: return False
-    
-    cursor = conn.cursor()
-    try:
-        cursor.execute("SELECT username FROM users WHERE username = ?", (username,))
-        if cursor.fetchone():
-            return False  # Usuário já existe
+    with db_connection() as conn:
+        if not conn: return False
 
-        hashed_pw = hash_password(password)
-        cursor.execute("INSERT INTO users (username, password, role) VALUES (?, ?, ?)", (username, hashed_pw, role))
-        conn.commit()
-        return True
-    except sqlite3.Error as e:
-        print(f"Erro ao criar usuário: {e}")
-        return False
-    finally:
-        conn.close()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT username FROM users WHERE username = ?", (username,))
+            if cursor.fetchone():
+                return False  # Usuário já existe
+
+            hashed_pw = hash_password(password)
+            cursor.execute("INSERT INTO users (username, password, role) VALUES (?, ?, ?)", (username, hashed_pw, role))
+            conn.commit()
+            _invalidate_user_cache()
+            return True
+        except sqlite3.Error as e:
+            print(f"Erro ao criar usuário: {e}")
+            return False
 
 def login_user(username: str, password: str) -> tuple[bool, str | None]:
     """
     Verifica as credenciais do usuário.
     Retorna uma tupla: (True, role) em caso de sucesso, ou (False, None) em caso de falha.
     """
-    conn = get_db_connection()
-    if not conn: return False, None
+    with db_connection() as conn:
+        if not conn: return False, None
 
-    cursor = conn.cursor()
-    try:
-        cursor.execute("SELECT password, role FROM users WHERE username = ?", (username,))
-        result = cursor.fetchone()
-
-        if result:
-            hashed_password_from_db, user_role = result
-            if check_password(password, hashed_password_from_db):
-                return True, user_role
-        
-        return False, None
-    except sqlite3.Error as e:
-        print(f"Erro ao fazer login: {e}")
-        return False, None
-    finally:
-        conn.close()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT password, role FROM users WHERE username = ?", (username,))
+            result = cursor.fetchone()
+        except sqlite3.Error as e:
+            print(f"Erro ao fazer login: {e}")
+            return False, None
+
+    # A verificação do bcrypt é feita depois de devolver a conexão ao pool
+    if result:
+        hashed_password_from_db, user_role = result
+        if check_password(password, hashed_password_from_db):
+            if needs_rehash(hashed_password_from_db):
+                rehash_password(username, password, hashed_password_from_db)
+            return True, user_role
+
+    return False, None
+
+def rehash_password(username: str, password: str, old_hashed_password: bytes):
+    """
+    Grava um novo hash da senha com o custo atual. A atualização só acontece se a
+    senha não tiver sido alterada por outra sessão desde a leitura do hash antigo.
+    """
+    new_hashed_pw = hash_password(password)
+    with db_connection() as conn:
+        if not conn: return
+        try:
+            conn.execute("UPDATE users SET password = ? WHERE username = ? AND password = ?", (new_hashed_pw, username, old_hashed_password))
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Erro ao atualizar o hash da senha: {e}")
 
 def change_password(username: str, old_password: str, new_password: str) -> bool:
     """
     Altera a senha de um usuário existente.
     """
-    conn = get_db_connection()
-    if not conn: return False
+    with db_connection() as conn:
+        if not conn: return False
 
-    cursor = conn.cursor()
-    try:
-        cursor.execute("SELECT password FROM users WHERE username = ?", (username,))
-        result = cursor.fetchone()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT password FROM users WHERE username = ?", (username,))
+            result = cursor.fetchone()
 
-        if not result or not check_password(old_password, result[0]):
-            return False
+            if not result or not check_password(old_password, result[0]):
+                return False
 
-        new_hashed_pw = hash_password(new_password)
-        cursor.execute("UPDATE users SET password = ? WHERE username = ?", (new_hashed_pw, username))
-        conn.commit()
-        return True
-    except sqlite3.Error as e:
-        print(f"Erro ao alterar senha: {e}")
-        return False
-    finally:
-        conn.close()
+            new_hashed_pw = hash_password(new_password)
+            cursor.execute("UPDATE users SET password = ?, session_version = session_version + 1 WHERE username = ?", (new_hashed_pw, username))
+            conn.commit()
+            _invalidate_user_cache()
+            return True
+        except sqlite3.Error as e:
+            print(f"Erro ao alterar senha: {e}")
+            return False
 
 def get_all_users() -> list:
     """Retorna uma lista de todos os usernames."""
-    conn = get_db_connection()
-    if not conn: return []
-    cursor = conn.cursor()
-    cursor.execute("SELECT username FROM users ORDER BY username")
-    users = [row[0] for row in cursor.fetchall()]
-    conn.close()
-    return users
+    def load():
+        with db_connection() as conn:
+            if not conn: return []
+            cursor = conn.cursor()
+            cursor.execute("SELECT username FROM users ORDER BY username")
+            return [row[0] for row in cursor.fetchall()]
+    # Devolve uma cópia, para que quem chama possa alterar a lista livremente
+    return list(_cached_user_query('all_users', load))
 
 def get_user_details(username: str) -> dict | None:
     """Busca os detalhes (role) de um usuário."""
-    conn = get_db_connection()
-    if not conn: return None
-    cursor = conn.cursor()
-    cursor.execute("SELECT role FROM users WHERE username = ?", (username,))
-    result = cursor.fetchone()
-    conn.close()
+    def load():
+        with db_connection() as conn:
+            if not conn: return None
+            cursor = conn.cursor()
+            cursor.execute("SELECT role FROM users WHERE username = ?", (username,))
+            return cursor.fetchone()
+    result = _cached_user_query(('user_details', username), load)
     if result:
         return {"role": result[0]}
     return None
@@ -171,19 +294,138 @@ def update_user_by_admin(username: str, new_password: str | None, new_role: str)
     """
     Permite que um admin atualize a senha e/ou o cargo de um usuário.
     """
-    conn = get_db_connection()
-    if not conn: return False
-    cursor = conn.cursor()
-    try:
-        if new_password:
-            new_hashed_pw = hash_password(new_password)
-            cursor.execute("UPDATE users SET password = ?, role = ? WHERE username = ?", (new_hashed_pw, new_role, username))
+    with db_connection() as conn:
+        if not conn: return False
+        cursor = conn.cursor()
+        try:
+            if new_password:
+                new_hashed_pw = hash_password(new_password)
+                cursor.execute("UPDATE users SET password = ?, role = ?, session_version = session_version + 1 WHERE username = ?", (new_hashed_pw, new_role, username))
+            else:
+                cursor.execute("UPDATE users SET role = ?, session_version = session_version + 1 WHERE username = ?", (new_role, username))
+            conn.commit()
+            _invalidate_user_cache()
+            return True
+        except sqlite3.Error as e:
+            print(f"Erro ao atualizar usuário pelo admin: {e}")
+            return False
+
+# --- Tokens de Sessão ---
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+def _get_session_key() -> bytes | None:
+    """Chave HMAC dos tokens: `SESSION_SECRET` ou a chave guardada no banco (criada na primeira vez)."""
+    global _session_key
+    if _session_key is None:
+        if SESSION_SECRET:
+            _session_key = SESSION_SECRET.encode('utf-8')
         else:
-            cursor.execute("UPDATE users SET role = ? WHERE username = ?", (new_role, username))
-        conn.commit()
-        return True
-    except sqlite3.Error as e:
-        print(f"Erro ao atualizar usuário pelo admin: {e}")
-        return False
-    finally:
-        conn.close()
+            with db_connection() as conn:
+                if not conn: return None
+                try:
+                    # Se outro processo criar a chave ao mesmo tempo, prevalece a primeira gravada
+                    conn.execute("INSERT OR IGNORE INTO app_secrets (name, value) VALUES ('session_key', ?)", (secrets.token_hex(32),))
+                    conn.commit()
+                    _session_key = conn.execute("SELECT value FROM app_secrets WHERE name = 'session_key'").fetchone()[0].encode('utf-8')
+                except sqlite3.Error as e:
+                    print(f"Erro ao carregar a chave das sessões: {e}")
+                    return None
+    return _session_key
+
+def _get_session_user(username: str):
+    """(role, session_version) do usuário, com o mesmo cache das demais consultas de usuários."""
+    def load():
+        with db_connection() as conn:
+            if not conn: return None
+            cursor = conn.cursor()
+            cursor.execute("SELECT role, session_version FROM users WHERE username = ?", (username,))
+            return cursor.fetchone()
+    return _cached_user_query(('session_user', username), load)
+
+def issue_session_token(username: str, ttl: int = SESSION_TOKEN_TTL) -> str | None:
+    """
+    Emite um token de sessão assinado (HMAC-SHA256) para um usuário já autenticado,
+    válido por `ttl` segundos. Retorna None se não for possível emiti-lo.
+    """
+    key, user = _get_session_key(), _get_session_user(username)
+    if key is None or user is None: return None
+    payload = _b64encode(json.dumps({'u': username, 'v': user[1], 'exp': int(time.time()) + ttl, 'jti': secrets.token_urlsafe(8)}, separators=(',', ':')).encode('utf-8'))
+    signature = _b64encode(hmac.new(key, payload.encode('ascii'), hashlib.sha256).digest())
+    return f"{payload}.{signature}"
+
+def _decode_session_token(token: str) -> dict | None:
+    key = _get_session_key()
+    # Tokens vêm da URL: qualquer coisa fora do formato (inclusive caracteres não ASCII) é inválida
+    if key is None or not token or not token.isascii() or token.count('.') != 1: return None
+    payload, signature = token.split('.')
+    expected = _b64encode(hmac.new(key, payload.encode('ascii'), hashlib.sha256).digest())
+    if not hmac.compare_digest(signature.encode('ascii'), expected.encode('ascii')): return None
+    try:
+        claims = json.loads(_b64decode(payload))
+    except ValueError:
+        return None
+    return claims if isinstance(claims, dict) else None
+
+def _is_token_revoked(jti: str) -> bool:
+    """
+    Indica se o token foi revogado, neste ou em outro processo do servidor. Os
+    tokens sabidamente revogados ficam em memória; os demais são consultados no
+    banco, com o mesmo cache das consultas de usuários.
+    """
+    with _revoked_tokens_lock:
+        if jti in _revoked_tokens: return True
+
+    def load():
+        with db_connection() as conn:
+            if not conn: return None
+            row = conn.execute("SELECT expires_at FROM revoked_tokens WHERE jti = ?", (jti,)).fetchone()
+            return row[0] if row else None
+
+    expires_at = _cached_user_query(('revoked_token', jti), load)
+    if expires_at is None: return False
+    with _revoked_tokens_lock:
+        _revoked_tokens[jti] = expires_at
+    return True
+
+def validate_session_token(token: str) -> tuple[str, str] | None:
+    """
+    Valida um token de sessão sem bcrypt: assinatura, validade, revogação explícita
+    (logout) e versão das sessões do usuário, que muda quando a senha ou o cargo
+    são alterados. Retorna (username, role) ou None se o token não for válido.
+    Alterações feitas por outros processos do servidor são vistas em até `USER_CACHE_TTL` segundos.
+    """
+    claims = _decode_session_token(token)
+    if not claims or claims.get('exp', 0) <= time.time(): return None
+    if _is_token_revoked(claims.get('jti')): return None
+    user = _get_session_user(claims.get('u'))
+    if user is None or user[1] != claims.get('v'): return None
+    return claims['u'], user[0]
+
+def revoke_session_token(token: str):
+    """
+    Revoga um token (logout) até o fim da sua validade. A revogação é gravada no
+    banco, e assim vale também após reinícios e nos outros processos que usam o
+    mesmo auth.db.
+    """
+    claims = _decode_session_token(token)
+    if not claims: return
+    now = time.time()
+    jti, expires_at = claims.get('jti'), claims.get('exp', now)
+    with _revoked_tokens_lock:
+        # Tokens revogados que já expiraram não precisam mais ser lembrados
+        for expired in [expired for expired, expired_at in _revoked_tokens.items() if expired_at <= now]:
+            del _revoked_tokens[expired]
+        _revoked_tokens[jti] = expires_at
+    with db_connection() as conn:
+        if not conn: return
+        try:
+            conn.execute("DELETE FROM revoked_tokens WHERE expires_at <= ?", (now,))
+            conn.execute("INSERT OR REPLACE INTO revoked_tokens (jti, expires_at) VALUES (?, ?)", (jti, expires_at))
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Erro ao revogar o token de sessão: {e}")
@@ -0,0 +1,81 @@
+"""
+Mede a montagem do quadro de tarefas (a mesma usada pelo app) contra o mock local
+da API do Holmes, em várias escalas, sem Streamlit.
+
+Uso (a partir da raiz do projeto):
+    python benchmarks/board_benchmark.py --scales 50x100 200x300 --latency-ms 20 --workers 8
+
+Cada escala (PROCESSOSxHISTÓRICO) é medida duas vezes sobre um armazenamento local
+vazio: "fria" (sincronização completa) e "quente" (sincronização incremental, sem
+eventos novos). Para cada execução são informados o tempo total, as requisições
+recebidas pelo mock por endpoint e o pico de memória alocada (tracemalloc).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_holmes import MockHolmesServer, generate_dataset, PROCESS_NAME
+
+def parse_scale(value: str) -> tuple[int, int]:
+    processes, history = value.lower().split("x")
+    return int(processes), int(history)
+
+def run_build(server, api_token: str, max_workers: int, db_name: str) -> dict:
+    """Executa uma montagem do quadro e retorna as medições."""
+    import task_board
+    from api_cache import shared_cache
+    from board import Board
+
+    # Cada execução deve ir ao mock, e não ao cache em memória da execução anterior
+    shared_cache.invalidate()
+    server.reset_counts()
+    tracemalloc.start()
+    start = time.perf_counter()
+    processes = task_board.fetch_processes(api_token, PROCESS_NAME)
+    _, all_tasks, errors, _ = task_board.build_all_tasks(processes, api_token, max_workers=max_workers, db_name=db_name)
+    board = Board(processes, all_tasks)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'elapsed': elapsed, 'tasks': len(board), 'errors': len(errors), 'requests': dict(server.request_counts), 'peak_mb': peak / 1024 / 1024}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", nargs="+", default=["10x50", "50x100", "200x300"], help="PROCESSOSxHISTÓRICO")
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--workers", type=int, default=None, help="padrão: DEFAULT_MAX_WORKERS")
+    parser.add_argument("--rate-limit", action="store_true", help="aplica o limitador de chamadas do app (desativado por padrão, pois o mock não tem limite)")
+    args = parser.parse_args()
+
+    server = MockHolmesServer({'processes': [], 'histories': {}, 'due_dates': {}}, latency=args.latency_ms / 1000).start()
+    # A URL base precisa estar definida antes de importar os módulos do app
+    os.environ['HOLMES_API_BASE_URL'] = server.base_url
+    import task_board
+    import task_store
+    from holmes_api import get_client
+    max_workers = args.workers or task_board.DEFAULT_MAX_WORKERS
+    if not args.rate_limit:
+        get_client("benchmark").limiter = None
+
+    print(f"latência={args.latency_ms:.0f}ms workers={max_workers} limitador={'sim' if args.rate_limit else 'não'}")
+    print(f"{'escala':>10} {'execução':>9} {'tempo (s)':>10} {'tarefas':>8} {'erros':>6} {'pico (MB)':>10}  requisições")
+    try:
+        for scale in args.scales:
+            num_processes, history = parse_scale(scale)
+            server.dataset = generate_dataset(num_processes, history)
+            db_name = os.path.join(tempfile.mkdtemp(prefix="board_bench_"), "tasks.db")
+            task_store.init_store(db_name)
+            for label in ("fria", "quente"):
+                result = run_build(server, "benchmark", max_workers, db_name)
+                requests = " ".join(f"{endpoint}={count}" for endpoint, count in sorted(result['requests'].items()))
+                print(f"{scale:>10} {label:>9} {result['elapsed']:>10.2f} {result['tasks']:>8} {result['errors']:>6} {result['peak_mb']:>10.1f}  {requests}")
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Mede a vazão de logins (login_user) em função do número de logins simultâneos.
+
+Uso (a partir da raiz do projeto):
+    python benchmarks/login_throughput.py --concurrency 1 2 4 8 16 --logins 64 --rounds 12
+
+Os usuários são criados em um banco SQLite temporário; o auth.db do app não é tocado.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--logins", type=int, default=64, help="logins por nível de concorrência")
+    parser.add_argument("--rounds", type=int, default=None, help="custo do bcrypt (padrão: BCRYPT_ROUNDS)")
+    args = parser.parse_args()
+
+    if args.rounds is not None:
+        os.environ['BCRYPT_ROUNDS'] = str(args.rounds)
+    tmp_dir = tempfile.mkdtemp(prefix="login_bench_")
+
+    import auth
+    auth.DB_NAME = os.path.join(tmp_dir, "auth.db")
+    auth.init_db()
+    users = [f"user{i}" for i in range(max(args.concurrency))]
+    for username in users:
+        auth.create_user(username, "senha")
+
+    def timed_login(i):
+        start = time.perf_counter()
+        ok, _ = auth.login_user(users[i % len(users)], "senha")
+        assert ok
+        return time.perf_counter() - start
+
+    print(f"bcrypt rounds={auth.BCRYPT_ROUNDS} pool={auth.BCRYPT_POOL_SIZE} logins={args.logins}")
+    print(f"{'concorrência':>12} {'logins/s':>10} {'p50 (ms)':>10} {'p95 (ms)':>10}")
+    for concurrency in args.concurrency:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            start = time.perf_counter()
+            latencies = sorted(executor.map(timed_login, range(args.logins)))
+            elapsed = time.perf_counter() - start
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"{concurrency:>12} {args.logins / elapsed:>10.1f} {statistics.median(latencies) * 1000:>10.1f} {p95 * 1000:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Servidor local que imita os endpoints da API do Holmes usados pelo app, com dados
+sintéticos e latência configurável. Serve para os benchmarks e também para rodar o
+app sem acesso à API real:
+
+    python benchmarks/mock_holmes.py --processes 200 --history 300 --latency-ms 50
+    HOLMES_API_BASE_URL=http://127.0.0.1:8765/v1 streamlit run app.py
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PROCESS_NAME = "Auditoria BIM"
+TASK_NAMES = ["Análise do Modelo", "Revisão de Compatibilização", "Verificação de Quantitativos", "Aprovação Final", "Ajustes do Projetista"]
+START_DATE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+def _iso(dt: datetime) -> str:
+    return dt.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+def generate_dataset(num_processes: int, history_per_process: int, completed_ratio: float = 0.7) -> dict:
+    """
+    Gera N processos com M entradas de histórico cada. Cada tarefa ocupa duas
+    entradas (criação e, para `completed_ratio` delas, conclusão via take_action).
+    """
+    processes, histories, due_dates = [], {}, {}
+    for p in range(num_processes):
+        process_id = f"{p:024x}"
+        status = 'closed' if p % 10 == 9 else 'opened'
+        processes.append({'id': process_id, 'identifier': f"AUD-{p:05d}", 'name': PROCESS_NAME, 'status': status})
+        entries = []
+        created = START_DATE + timedelta(hours=p)
+        for i in range(history_per_process // 2):
+            task_id = f"{p:012x}{i:012x}"
+            task_name = TASK_NAMES[i % len(TASK_NAMES)]
+            created += timedelta(minutes=7)
+            entries.append({'key': 'history.task_created', 'created_at': _iso(created), 'properties': {'task_id': task_id, 'task_name': task_name, 'long_link': f"https://example.invalid/tasks/{task_id}"}})
+            if (i % 10) < completed_ratio * 10:
+                entries.append({'key': 'history.take_action', 'created_at': _iso(created + timedelta(minutes=3)), 'properties': {'task_id': task_id, 'task_name': task_name}})
+            else:
+                due_dates[task_id] = _iso(created + timedelta(days=5))
+        entries.sort(key=lambda e: e['created_at'])
+        histories[process_id] = entries
+    return {'processes': processes, 'histories': histories, 'due_dates': due_dates}
+
+def bpmn_template_xml() -> str:
+    tasks = "".join(f'<bpmn:userTask id="Task_{i}" name="{name}"/>' for i, name in enumerate(TASK_NAMES))
+    shapes = "".join(f'<bpmndi:BPMNShape id="Task_{i}_di" bpmnElement="Task_{i}"><dc:Bounds x="{100 + i * 150}" y="100" width="100" height="80"/></bpmndi:BPMNShape>' for i in range(len(TASK_NAMES)))
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<bpmn:definitions xmlns:bpmn="http://www.omg.org/spec/BPMN/20100524/MODEL" xmlns:bpmndi="http://www.omg.org/spec/BPMN/20100524/DI" '
+            'xmlns:dc="http://www.omg.org/spec/DD/20100524/DC" id="Definitions_1" targetNamespace="http://bpmn.io/schema/bpmn">'
+            f'<bpmn:process id="Process_1" isExecutable="false">{tasks}</bpmn:process>'
+            f'<bpmndi:BPMNDiagram id="BPMNDiagram_1"><bpmndi:BPMNPlane id="BPMNPlane_1" bpmnElement="Process_1">{shapes}</bpmndi:BPMNPlane></bpmndi:BPMNDiagram>'
+            '</bpmn:definitions>')
+
+class MockHolmesServer:
+    """
+    Servidor HTTP em uma thread, com os endpoints:
+    GET /v1/processes/, POST /v1/processes/{id}/history, GET /v1/tasks/{id},
+    GET /v1/admin/processes/{id}/troubleshooting/template, POST /v1/workflows/{id}/start
+    e POST /v1/entities/{id}/instances/search.
+    `request_counts` conta as chamadas recebidas por endpoint.
+    """
+
+    def __init__(self, dataset: dict, latency: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        self.dataset = dataset
+        self.latency = latency
+        self.request_counts = Counter()
+        self._counts_lock = threading.Lock()
+        self._template = bpmn_template_xml()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def reset_counts(self):
+        with self._counts_lock:
+            self.request_counts.clear()
+
+    def _count(self, endpoint: str):
+        with self._counts_lock:
+            self.request_counts[endpoint] += 1
+
+    def _route(self, method: str, path: str, body: dict | None):
+        data = self.dataset
+        if method == 'GET' and path == '/v1/processes/':
+            return 'processes', {'processes': data['processes']}
+        if match := re.fullmatch(r'/v1/processes/(\w+)/history', path):
+            entries = data['histories'].get(match.group(1))
+            if entries is None: return 'history', None
+            body = body or {}
+            page, per_page = int(body.get('page', 1)), int(body.get('per_page', 100))
+            _, order = (body.get('sortBy') or ['created_at', 'asc'])[:2]
+            ordered = entries if order == 'asc' else entries[::-1]
+            return 'history', {'histories': ordered[(page - 1) * per_page:page * per_page], 'total': len(entries)}
+        if match := re.fullmatch(r'/v1/tasks/(\w+)', path):
+            return 'tasks', {'id': match.group(1), 'due_date': data['due_dates'].get(match.group(1))}
+        if re.fullmatch(r'/v1/admin/processes/(\w+)/troubleshooting/template', path):
+            return 'template', {'xml': self._template}
+        if method == 'POST' and re.fullmatch(r'/v1/workflows/(\w+)/start', path):
+            return 'workflow_start', {'id': f"{len(data['processes']):024x}"}
+        if method == 'POST' and re.fullmatch(r'/v1/entities/(\w+)/instances/search', path):
+            query = (body or {}).get('query', {})
+            start, size, total = int(query.get('from', 0)), int(query.get('size', 200)), data.get('instances', 50)
+            docs = [{'instance_id': f"{i:024x}", 'props': [{'value': f"Empreendimento {i:03d}"}]} for i in range(start, min(start + size, total))]
+            return 'instances_search', {'docs': docs, 'total': total}
+        return 'unknown', None
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Mantém a conexão aberta entre chamadas, como a API real
+            protocol_version = "HTTP/1.1"
+            # Cabeçalhos e corpo são escritos separadamente; sem TCP_NODELAY, o ACK atrasado
+            # do cliente somaria ~40 ms a cada resposta na conexão mantida aberta
+            disable_nagle_algorithm = True
+
+            def _respond(self, method):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                endpoint, payload = server._route(method, self.path.split('?', 1)[0], body)
+                server._count(endpoint)
+                if server.latency: time.sleep(server.latency)
+                content = json.dumps(payload if payload is not None else {'error': 'not found'}).encode('utf-8')
+                self.send_response(200 if payload is not None else 404)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def do_GET(self): self._respond('GET')
+            def do_POST(self): self._respond('POST')
+            def log_message(self, *args): pass
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=50)
+    parser.add_argument("--history", type=int, default=100, help="entradas de histórico por processo")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    server = MockHolmesServer(generate_dataset(args.processes, args.history), latency=args.latency_ms / 1000, port=args.port).start()
+    print(f"Mock da API do Holmes em {server.base_url} (Ctrl+C para encerrar)")
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
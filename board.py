@@ -0,0 +1,87 @@
+from dataclasses import dataclass
+from datetime import datetime
+from timestamps import parse_timestamp, MIN_TIMESTAMP
+
+# Estados das tarefas no quadro (os mesmos usados para colorir o diagrama BPMN)
+PENDING = 'pending'
+COMPLETED = 'completed'
+
+@dataclass(frozen=True, slots=True)
+class TaskRecord:
+    """
+    Uma tarefa do quadro. Imutável, para poder ser compartilhada entre sessões.
+    As datas já são convertidas para datetime (UTC) na montagem do quadro.
+    """
+    task_id: str
+    process_id: str
+    process_identifier: str
+    task_name: str
+    long_link: str | None
+    created_at: datetime | None
+    is_completed: bool = False
+    completion_date: datetime | None = None
+    due_date: datetime | None = None
+    # Dados que não puderam ser atualizados na última montagem (ex.: limite de chamadas)
+    stale: bool = False
+
+    @property
+    def status(self) -> str:
+        return COMPLETED if self.is_completed else PENDING
+
+    @classmethod
+    def from_dict(cls, task: dict) -> 'TaskRecord':
+        """Converte uma tarefa no formato de `task_store.load_all_tasks`."""
+        return cls(task['task_id'], task['process_id'], task['process_identifier'], task['task_name'], task.get('long_link'),
+                   parse_timestamp(task['created_at']), bool(task.get('is_completed')),
+                   parse_timestamp(task.get('completion_date')), parse_timestamp(task.get('due_date')), bool(task.get('stale')))
+
+class Board:
+    """
+    Quadro de tarefas, independente do Streamlit. As tarefas são ordenadas (mais
+    recentes primeiro) e indexadas por processo e por estado uma única vez, na
+    montagem; as consultas apenas devolvem as tuplas já prontas, sem percorrer
+    nem reordenar o quadro inteiro.
+    Processos fechados ('closed') ficam de fora das consultas, a menos que
+    `include_closed=True`.
+    """
+    __slots__ = ('processes', 'records', '_process_ids', '_identifiers', '_by_status', '_by_process')
+
+    def __init__(self, processes: list = (), all_tasks: dict | None = None):
+        self.processes = list(processes)
+        self._process_ids = {p['identifier']: p['id'] for p in self.processes if p.get('identifier') and p.get('id')}
+        closed_ids = {p['id'] for p in self.processes if p.get('status') == 'closed'}
+        records = sorted((TaskRecord.from_dict(task) for task in (all_tasks or {}).values()), key=lambda t: t.created_at or MIN_TIMESTAMP, reverse=True)
+        self.records = tuple(records)
+
+        by_status = {(status, include_closed): [] for status in (PENDING, COMPLETED) for include_closed in (False, True)}
+        by_process = {}
+        for record in self.records:
+            by_status[record.status, True].append(record)
+            if record.process_id not in closed_ids:
+                by_status[record.status, False].append(record)
+            by_process.setdefault(record.process_identifier, {PENDING: [], COMPLETED: []})[record.status].append(record)
+        self._by_status = {key: tuple(tasks) for key, tasks in by_status.items()}
+        self._by_process = {identifier: {status: tuple(tasks) for status, tasks in statuses.items()} for identifier, statuses in by_process.items()}
+        self._identifiers = {
+            include_closed: tuple(sorted({p['identifier'] for p in self.processes if p.get('identifier') and (include_closed or p.get('status') != 'closed')}))
+            for include_closed in (False, True)
+        }
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def process_identifiers(self, include_closed: bool = False) -> tuple:
+        """Identificadores dos processos, em ordem alfabética."""
+        return self._identifiers[include_closed]
+
+    def process_id(self, process_identifier: str) -> str | None:
+        return self._process_ids.get(process_identifier)
+
+    def tasks(self, status: str, process_identifier: str | None = None, include_closed: bool = False) -> tuple:
+        """
+        Tarefas com o estado informado (PENDING ou COMPLETED), das mais recentes para
+        as mais antigas, de todos os processos ou apenas de `process_identifier`.
+        """
+        if process_identifier is None:
+            return self._by_status[status, include_closed]
+        return self._by_process.get(process_identifier, {}).get(status, ())
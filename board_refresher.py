@@ -0,0 +1,214 @@
+import os
+import socket
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from task_board import build_all_tasks, fetch_processes, DEFAULT_MAX_WORKERS
+from instrumentation import log_event
+from board import Board
+from shared_snapshot import SharedSnapshotStore
+
+# Intervalo padrão (segundos) entre as atualizações do quadro em segundo plano
+DEFAULT_REFRESH_SECONDS = 60
+
+# Com o snapshot compartilhado, intervalo (segundos) com que cada processo verifica
+# a versão publicada (seguidores) ou os pedidos de atualização antecipada (líder)
+SHARED_POLL_SECONDS = 5
+
+@dataclass(frozen=True)
+class BoardSnapshot:
+    """
+    Estado do quadro montado pela última atualização em segundo plano.
+    `version` só muda quando os processos ou as tarefas mudam. O `Board` é
+    imutável e compartilhado entre sessões; a lista de processos não deve ser
+    alterada por quem a lê.
+    """
+    version: int
+    built_at: float
+    processes: list
+    board: Board
+    errors: list = field(default_factory=list)
+    stats: dict = field(default_factory=dict)
+
+class BoardRefresher:
+    """
+    Worker em segundo plano que remonta o quadro periodicamente e publica o
+    resultado como um `BoardSnapshot`. Existe um único worker por processo do
+    servidor (veja `get_refresher`), de modo que o custo das atualizações não
+    depende de quantas sessões estão abertas.
+
+    Com um `shared_store`, os vários processos do servidor (réplicas) elegem um
+    líder: só ele chama a API e publica o snapshot no armazenamento compartilhado;
+    os demais carregam cada nova versão publicada, sem chamadas à API. Se o líder
+    parar de renovar a liderança, outro processo assume ao fim do prazo.
+    """
+
+    def __init__(self, api_token: str, process_name: str | None = None, interval: float = DEFAULT_REFRESH_SECONDS,
+                 max_workers: int = DEFAULT_MAX_WORKERS, shared_store: SharedSnapshotStore | None = None):
+        self.api_token = api_token
+        self.process_name = process_name
+        self.interval = interval
+        self.max_workers = max_workers
+        self.shared_store = shared_store
+        self.shared_name = f"board:{process_name or ''}"
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{id(self)}"
+        # O prazo da liderança precisa cobrir uma montagem demorada entre duas renovações
+        self.lease_seconds = max(3 * interval, 120)
+        self.is_leader = self.shared_store is None
+        self.last_error = None
+        self._snapshot = None
+        self._built_count = 0
+        self._building = False
+        self._last_build_started = 0.0
+        self._condition = threading.Condition()
+        self._wakeup = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="board-refresher", daemon=True)
+
+    def start(self):
+        if not self._thread.is_alive():
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._wakeup.clear()
+                self._building = True
+            try:
+                if self.shared_store is None:
+                    self._refresh()
+                else:
+                    self._refresh_shared()
+            except Exception as e:
+                print(f"Erro ao atualizar o quadro em segundo plano: {e}")
+                with self._condition:
+                    self.last_error = e
+            with self._condition:
+                self._building = False
+                self._built_count += 1
+                self._condition.notify_all()
+            self._wakeup.wait(self.interval if self.shared_store is None else min(self.interval, SHARED_POLL_SECONDS))
+
+    def _build(self):
+        """Monta o quadro a partir da API. Retorna (processes, all_tasks, board, errors, stats)."""
+        start = time.perf_counter()
+        processes = fetch_processes(self.api_token, self.process_name)
+        stats_processes_seconds = round(time.perf_counter() - start, 4)
+        _, all_tasks, errors, stats = build_all_tasks(processes, self.api_token, max_workers=self.max_workers)
+        board = Board(processes, all_tasks)
+        stats = dict(stats, processes_seconds=stats_processes_seconds, total_seconds=round(time.perf_counter() - start, 4))
+        return processes, all_tasks, board, errors, stats
+
+    def _publish(self, processes, board, errors, stats, version=None, built_at=None) -> BoardSnapshot:
+        """Publica um snapshot neste processo. Sem `version`, ela só avança se o quadro mudou."""
+        with self._condition:
+            previous = self._snapshot
+            if version is None:
+                changed = previous is None or previous.processes != processes or previous.board.records != board.records
+                version = (previous.version + 1 if previous else 1) if changed else previous.version
+            self._snapshot = BoardSnapshot(version, built_at or time.time(), processes, board, errors, stats)
+            self.last_error = None
+            return self._snapshot
+
+    def _refresh(self):
+        processes, _, board, errors, stats = self._build()
+        snapshot = self._publish(processes, board, errors, stats)
+        log_event('board_build', version=snapshot.version, processes=len(processes), tasks=len(board), errors=len(errors), **stats)
+
+    def _load_shared(self):
+        loaded = self.shared_store.load(self.shared_name)
+        if loaded is None: return
+        version, built_at, payload = loaded
+        processes = payload['processes']
+        # Os erros chegam como texto; o app só os exibe
+        errors = [tuple(error) for error in payload['errors']]
+        self._publish(processes, Board(processes, payload['all_tasks']), errors, payload['stats'], version=version, built_at=built_at)
+
+    def _refresh_shared(self):
+        """
+        Um ciclo no modo compartilhado. Todos os processos acompanham o snapshot
+        publicado (o conteúdo só é carregado quando a versão muda); o líder, além
+        disso, remonta o quadro a cada `interval` ou quando alguém pede uma
+        atualização antecipada. Um seguidor sem snapshot (o líder ainda não publicou,
+        ou sua primeira montagem falhou) registra isso em `last_error` e conclui o
+        ciclo, para que as sessões não fiquem esperando indefinidamente.
+        """
+        store, name = self.shared_store, self.shared_name
+        self.is_leader = store.try_acquire(name, self.owner, self.lease_seconds)
+        header = store.read_header(name)
+        if header and header[0] > self.current_version():
+            self._load_shared()
+        elif header and self._snapshot and header[1] > self._snapshot.built_at:
+            # Mesma versão, remontada mais tarde: só a idade dos dados muda
+            with self._condition:
+                self._snapshot = replace(self._snapshot, built_at=header[1])
+        if not self.is_leader:
+            if self._snapshot is None:
+                with self._condition:
+                    self.last_error = RuntimeError("O quadro ainda não foi publicado pelo processo responsável por montá-lo")
+            return
+
+        now = time.time()
+        if now - self._last_build_started < self.interval and store.refresh_requested_at(name) <= self._last_build_started:
+            return
+        self._last_build_started = now
+        previous_version = self.current_version()
+        processes, all_tasks, board, errors, stats = self._build()
+        # O horário registrado é o do início da montagem, para que quem pediu uma
+        # atualização saiba se ela começou depois do pedido
+        snapshot = self._publish(processes, board, errors, stats, built_at=now)
+        payload = None
+        if snapshot.version != previous_version:
+            payload = {'processes': processes, 'all_tasks': all_tasks, 'errors': [[url, str(e)] for url, e in errors], 'stats': stats}
+        store.publish(name, self.owner, snapshot.version, snapshot.built_at, payload)
+        log_event('board_build', version=snapshot.version, processes=len(processes), tasks=len(board), errors=len(errors), shared=True, **stats)
+
+    def current_version(self) -> int:
+        """Versão do último snapshot publicado (0 se ainda não houver nenhum)."""
+        snapshot = self._snapshot
+        return snapshot.version if snapshot else 0
+
+    def wait_for_snapshot(self, timeout: float | None = None) -> BoardSnapshot | None:
+        """Retorna o último snapshot, aguardando a primeira atualização se necessário."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._snapshot is not None or self._built_count > 0, timeout)
+            return self._snapshot
+
+    def refresh_now(self, timeout: float | None = None) -> BoardSnapshot | None:
+        """
+        Antecipa a próxima atualização e aguarda sua conclusão por no máximo `timeout`
+        segundos; depois disso, a atualização continua em segundo plano.
+        """
+        if self.shared_store is not None:
+            # O pedido vai para o líder, que pode ser outro processo; aguarda uma
+            # montagem feita depois do pedido (no máximo o prazo da liderança)
+            requested_at = self.shared_store.request_refresh(self.shared_name)
+            self._wakeup.set()
+            with self._condition:
+                self._condition.wait_for(lambda: self._snapshot is not None and self._snapshot.built_at >= requested_at,
+                                         timeout if timeout is not None else self.lease_seconds)
+                return self._snapshot
+        with self._condition:
+            # Se uma atualização já está em andamento, ela pode ter começado antes
+            # da mudança que motivou o pedido; por isso aguardamos a seguinte.
+            target = self._built_count + (2 if self._building else 1)
+            self._wakeup.set()
+            self._condition.wait_for(lambda: self._built_count >= target, timeout)
+            return self._snapshot
+
+_refreshers = {}
+_refreshers_lock = threading.Lock()
+
+def get_refresher(api_token: str, process_name: str | None = None, interval: float = DEFAULT_REFRESH_SECONDS,
+                  max_workers: int = DEFAULT_MAX_WORKERS, shared_db: str | None = None) -> BoardRefresher:
+    """
+    Retorna (e inicia, se necessário) o worker compartilhado do processo do servidor.
+    Com `shared_db`, o snapshot é compartilhado entre os processos que usam o mesmo arquivo.
+    """
+    with _refreshers_lock:
+        key = (api_token, process_name)
+        refresher = _refreshers.get(key)
+        if refresher is None:
+            shared_store = SharedSnapshotStore(shared_db) if shared_db else None
+            refresher = _refreshers[key] = BoardRefresher(api_token, process_name, interval=interval, max_workers=max_workers, shared_store=shared_store)
+        refresher.start()
+        return refresher
@@ -0,0 +1,65 @@
+import hashlib
+import math
+import unicodedata
+import xml.etree.ElementTree as ET
+from api_cache import TTLCache
+
+# Namespaces dos elementos gráficos (DI) do BPMN, que não representam tarefas
+_DI_NAMESPACES = (
+    "{http://www.omg.org/spec/BPMN/20100524/DI}",
+    "{http://www.omg.org/spec/DD/20100524/DI}",
+    "{http://www.omg.org/spec/DD/20100524/DC}",
+)
+
+# Mapeamentos já calculados, por hash do template
+_mapping_cache = TTLCache(max_entries=64)
+
+def normalize_name(name) -> str:
+    """
+    Mesma normalização do `normalizeString` do main.js: decomposição NFD, remoção
+    dos acentos (U+0300 a U+036F), minúsculas e sem espaços nas pontas.
+    """
+    if not isinstance(name, str): return ''
+    decomposed = unicodedata.normalize('NFD', name)
+    return ''.join(c for c in decomposed if not '\u0300' <= c <= '\u036f').lower().strip()
+
+def template_hash(xml_content: str) -> str:
+    return hashlib.sha256(xml_content.encode('utf-8')).hexdigest()
+
+def parse_template(xml_content: str) -> dict:
+    """
+    Lê o XML de um template BPMN e retorna {nome normalizado: [ids dos elementos]}
+    para todos os elementos com nome (tarefas, eventos, gateways etc.).
+    Retorna um dicionário vazio se o XML for inválido.
+    """
+    try:
+        root = ET.fromstring(xml_content)
+    except ET.ParseError as e:
+        print(f"Erro ao ler o template BPMN: {e}")
+        return {}
+    mapping = {}
+    for element in root.iter():
+        if element.tag.startswith(_DI_NAMESPACES): continue
+        element_id, name = element.get('id'), element.get('name')
+        if element_id and name:
+            mapping.setdefault(normalize_name(name), []).append(element_id)
+    return mapping
+
+def get_name_mapping(xml_content: str) -> dict:
+    """
+    Retorna o mapeamento nome normalizado -> ids do template, calculado uma única
+    vez por template (a chave é o hash do XML) e compartilhado entre sessões.
+    """
+    return _mapping_cache.get_or_load(template_hash(xml_content), lambda: parse_template(xml_content), math.inf)
+
+def element_states(mapping: dict, completed_names, pending_names) -> dict:
+    """
+    Converte os nomes das tarefas concluídas e pendentes em {id do elemento: estado}.
+    Se uma tarefa pendente e uma concluída apontarem para o mesmo elemento, prevalece a pendente.
+    """
+    states = {}
+    for names, state in ((completed_names, 'completed'), (pending_names, 'pending')):
+        for name in names:
+            for element_id in mapping.get(normalize_name(name), []):
+                states[element_id] = state
+    return states
@@ -0,0 +1,22 @@
+// Repassa ao componente BPMN apenas as mudanças de estado das tarefas desde a
+// última atualização, sem recriar o iframe do diagrama.
+(function() {
+    const message = window.bpmnStateMessage;
+    if (!message) return;
+
+    // Estado completo por processo, guardado na página para que um diagrama
+    // recém-importado possa se colorir sem esperar a próxima mensagem.
+    const store = window.parent.__bpmnTaskStates = window.parent.__bpmnTaskStates || {};
+    // `reset` indica que `changes` contém o estado completo (primeiro envio da sessão)
+    if (message.reset) store[message.processId] = {};
+    const states = store[message.processId] = store[message.processId] || {};
+    Object.entries(message.changes).forEach(([elementId, state]) => {
+        if (state) { states[elementId] = state; } else { delete states[elementId]; }
+    });
+
+    for (let i = 0; i < window.parent.frames.length; i++) {
+        const frame = window.parent.frames[i];
+        if (frame === window) continue;
+        frame.postMessage({ type: 'bpmn-task-states', processId: message.processId, changes: message.changes, reset: !!message.reset }, '*');
+    }
+})();
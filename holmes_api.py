@@ -0,0 +1,169 @@
+import math
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from rate_limiter import RateLimiter, shared_limiter, PRIORITY_NORMAL
+
+load_dotenv()
+
+# URL base da API do Holmes (pode apontar para o mock de benchmarks/mock_holmes.py)
+API_BASE_URL = os.getenv('HOLMES_API_BASE_URL', "https://app-api.holmesdoc.io/v1")
+
+# Tempo máximo (segundos) para abrir a conexão e para aguardar a resposta
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 30
+
+# Novas tentativas para chamadas idempotentes que falham com estes status
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Conexões mantidas abertas por host; deve cobrir o número de chamadas simultâneas do quadro
+DEFAULT_POOL_SIZE = 32
+
+_ID_SEGMENT = re.compile(r"^(?=.*\d)[0-9A-Za-z_-]{8,}$")
+
+def endpoint_key(url: str) -> str:
+    """
+    Agrupa URLs por endpoint para as métricas, trocando os segmentos que são
+    identificadores por `{id}` (ex.: `/v1/tasks/{id}`).
+    """
+    path = url.split("://", 1)[-1].split("?", 1)[0]
+    path = path.split("/", 1)[1] if "/" in path else ""
+    segments = ["{id}" if _ID_SEGMENT.match(segment) else segment for segment in path.split("/") if segment]
+    return "/" + "/".join(segments)
+
+def parse_retry_after(value: str) -> float | None:
+    """
+    Segundos de espera pedidos no cabeçalho Retry-After, que pode trazer um
+    número de segundos ou uma data HTTP. Datas no passado valem 0; retorna None
+    se o valor for inválido.
+    """
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at is None: return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        seconds = (retry_at - datetime.now(timezone.utc)).total_seconds()
+    return max(0.0, seconds) if math.isfinite(seconds) else None
+
+class HolmesClient:
+    """
+    Cliente HTTP da API do Holmes, com conexões persistentes (keep-alive),
+    timeouts de conexão e leitura, novas tentativas com backoff para chamadas
+    idempotentes e métricas de latência e erros por endpoint.
+    Toda chamada (inclusive cada nova tentativa) passa antes pelo `limiter`.
+    É seguro usar a mesma instância em várias threads e sessões.
+    """
+
+    def __init__(self, api_token: str, pool_size: int = DEFAULT_POOL_SIZE,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT, read_timeout: float = DEFAULT_READ_TIMEOUT,
+                 max_retries: int = DEFAULT_MAX_RETRIES, backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+                 limiter: RateLimiter | None = shared_limiter):
+        self.api_token = api_token
+        self.limiter = limiter
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._metrics = {}
+        self._metrics_lock = threading.Lock()
+
+    def _record(self, url: str, elapsed: float, error: bool, retry: bool):
+        key = endpoint_key(url)
+        with self._metrics_lock:
+            m = self._metrics.setdefault(key, {'requests': 0, 'errors': 0, 'retries': 0, 'total_time': 0.0, 'max_time': 0.0})
+            m['requests'] += 1
+            m['total_time'] += elapsed
+            m['max_time'] = max(m['max_time'], elapsed)
+            if error: m['errors'] += 1
+            if retry: m['retries'] += 1
+
+    def _retry_delay(self, attempt: int, response) -> float:
+        """
+        Espera antes da próxima tentativa: o Retry-After da resposta, limitado ao
+        timeout de leitura (ele também suspende o limitador e o worker do quadro),
+        ou o backoff exponencial.
+        """
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        delay = parse_retry_after(retry_after) if retry_after else None
+        if delay is not None:
+            return min(delay, self.timeout[1])
+        return self.backoff_factor * (2 ** attempt)
+
+    def request_json(self, url: str, method: str = 'GET', payload: dict | None = None, idempotent: bool | None = None,
+                     priority: int = PRIORITY_NORMAL):
+        """
+        Executa a chamada e retorna o JSON da resposta; erros são propagados como exceção
+        (inclusive `RateLimitExceeded`, se o limitador não liberar a chamada a tempo).
+        Por padrão, apenas GET é repetido em caso de falha. Consultas feitas via POST
+        (ex.: /history) podem ser marcadas como `idempotent=True`; ações como iniciar
+        um workflow nunca devem ser. `priority` é a classe de prioridade no limitador.
+        """
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method == 'GET'
+        headers = {'api_token': self.api_token}
+        if method == 'POST':
+            headers['Content-Type'] = 'application/json'
+        attempts = 1 + (self.max_retries if idempotent else 0)
+
+        for attempt in range(attempts):
+            if self.limiter is not None:
+                self.limiter.acquire(endpoint_key(url), priority)
+            start = time.perf_counter()
+            response = None
+            try:
+                response = self.session.request(method, url, headers=headers, json=payload if method == 'POST' else None, timeout=self.timeout)
+                response.raise_for_status()
+                self._record(url, time.perf_counter() - start, error=False, retry=attempt > 0)
+                return response.json()
+            except requests.HTTPError:
+                self._record(url, time.perf_counter() - start, error=True, retry=attempt > 0)
+                if response.status_code == 429 and self.limiter is not None:
+                    # A API pediu para diminuir o ritmo: todas as chamadas aguardam, não só esta
+                    self.limiter.throttle(self._retry_delay(attempt, response))
+                if response.status_code not in RETRY_STATUSES or attempt + 1 >= attempts:
+                    raise
+            except (requests.ConnectionError, requests.Timeout):
+                self._record(url, time.perf_counter() - start, error=True, retry=attempt > 0)
+                if attempt + 1 >= attempts:
+                    raise
+            time.sleep(self._retry_delay(attempt, response))
+
+    def metrics(self) -> dict:
+        """Retorna uma cópia das métricas por endpoint, incluindo a latência média."""
+        with self._metrics_lock:
+            snapshot = {key: dict(m) for key, m in self._metrics.items()}
+        for m in snapshot.values():
+            m['avg_time'] = m['total_time'] / m['requests'] if m['requests'] else 0.0
+        return snapshot
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(api_token: str) -> HolmesClient:
+    """
+    Retorna o cliente compartilhado do processo para o token informado.
+    Como o módulo é importado uma única vez pelo servidor, o pool de conexões
+    é reaproveitado entre reruns e entre sessões.
+    """
+    with _clients_lock:
+        client = _clients.get(api_token)
+        if client is None:
+            client = _clients[api_token] = HolmesClient(api_token)
+        return client
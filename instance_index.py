@@ -0,0 +1,182 @@
+import threading
+import time
+from holmes_api import API_BASE_URL, get_client
+from rate_limiter import PRIORITY_BACKGROUND, PRIORITY_NORMAL
+from bpmn_mapping import normalize_name
+import task_store
+
+# Quantidade de instâncias pedidas por página ao endpoint de busca
+INSTANCE_PAGE_SIZE = 200
+
+# Idade máxima (segundos) do índice antes de uma nova sincronização em segundo plano
+INSTANCE_SYNC_SECONDS = 600
+
+# Quantidade máxima de resultados devolvidos por uma busca
+SEARCH_LIMIT = 50
+
+_syncing = set()
+_syncing_lock = threading.Lock()
+# Bancos cujo índice já foi inicializado neste processo (o app chama `init_index` a cada rerun)
+_initialized = set()
+_entity_locks = {}
+
+def _entity_lock(entity_id: str) -> threading.Lock:
+    """Lock das sincronizações de uma entidade neste processo."""
+    with _syncing_lock:
+        return _entity_locks.setdefault(entity_id, threading.Lock())
+
+def init_index(db_name: str = task_store.STORE_DB_NAME):
+    """
+    Cria as tabelas do índice local de instâncias (no mesmo banco do task_store), caso não existam:
+    - instances: instâncias de cada entidade, com o nome normalizado usado na busca;
+    - instance_syncs: horário da última sincronização completa de cada entidade.
+    Cada banco é inicializado uma única vez por processo.
+    """
+    with _syncing_lock:
+        if db_name in _initialized: return
+        _init_tables(db_name)
+        _initialized.add(db_name)
+
+def _init_tables(db_name: str):
+    conn = task_store.get_store_connection(db_name)
+    try:
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS instances (
+                instance_id TEXT PRIMARY KEY,
+                entity_id TEXT NOT NULL,
+                display_name TEXT NOT NULL,
+                search_name TEXT NOT NULL,
+                seen_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_instances_search ON instances (entity_id, search_name);
+            CREATE TABLE IF NOT EXISTS instance_syncs (
+                entity_id TEXT PRIMARY KEY,
+                synced_at REAL NOT NULL
+            );
+        """)
+        conn.commit()
+    finally:
+        conn.close()
+
+def search_url(entity_id: str) -> str:
+    return f"{API_BASE_URL}/entities/{entity_id}/instances/search"
+
+def search_payload(entity_id: str, sort_field: str, start: int, size: int = INSTANCE_PAGE_SIZE) -> dict:
+    return {"query": {"from": start, "size": size, "order": "asc", "groups": [{"match_all": True, "terms": [{"field": "entity_id", "type": "is", "value": entity_id}]}], "sort": sort_field}}
+
+def parse_instances(docs: list) -> list:
+    """Extrai (instance_id, nome de exibição) dos documentos da busca, ignorando os incompletos."""
+    instances = []
+    for doc in docs:
+        if doc.get('props') and len(doc['props']) > 0 and 'value' in doc['props'][0]:
+            display_name, instance_id = doc['props'][0]['value'], doc.get('instance_id')
+            if display_name and instance_id: instances.append((instance_id, str(display_name)))
+    return instances
+
+def last_synced_at(entity_id: str, db_name: str = task_store.STORE_DB_NAME) -> float | None:
+    conn = task_store.get_store_connection(db_name)
+    try:
+        row = conn.execute("SELECT synced_at FROM instance_syncs WHERE entity_id = ?", (entity_id,)).fetchone()
+        return row['synced_at'] if row else None
+    finally:
+        conn.close()
+
+def sync_instances(api_token: str, entity_id: str, sort_field: str, page_size: int = INSTANCE_PAGE_SIZE,
+                   priority: int = PRIORITY_BACKGROUND, db_name: str = task_store.STORE_DB_NAME) -> int:
+    """
+    Percorre todas as páginas do endpoint de busca e atualiza o índice local.
+    Cada página é gravada assim que chega (as buscas já enxergam o que foi
+    sincronizado); ao final de uma sincronização completa, as instâncias que não
+    apareceram mais são removidas. Erros são propagados como exceção, e nesse caso
+    nada é removido. Retorna a quantidade de instâncias encontradas.
+    `seen_at` nunca volta atrás, para que uma sincronização mais antiga que termine
+    depois (ex.: em outra réplica) não faça a mais recente remover instâncias válidas.
+    """
+    client = get_client(api_token)
+    started_at = time.time()
+    start, found = 0, 0
+    while True:
+        data = client.request_json(search_url(entity_id), method='POST', payload=search_payload(entity_id, sort_field, start, page_size), idempotent=True, priority=priority) or {}
+        docs = data.get('docs', [])
+        instances = parse_instances(docs)
+        found += len(instances)
+        conn = task_store.get_store_connection(db_name)
+        try:
+            conn.executemany(
+                "INSERT INTO instances (instance_id, entity_id, display_name, search_name, seen_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(instance_id) DO UPDATE SET entity_id = excluded.entity_id, display_name = excluded.display_name, "
+                "search_name = excluded.search_name, seen_at = MAX(instances.seen_at, excluded.seen_at)",
+                [(instance_id, entity_id, display_name, normalize_name(display_name), started_at) for instance_id, display_name in instances]
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        start += len(docs)
+        total = data.get('total')
+        if len(docs) < page_size or (total is not None and start >= total): break
+
+    conn = task_store.get_store_connection(db_name)
+    try:
+        conn.execute("DELETE FROM instances WHERE entity_id = ? AND seen_at < ?", (entity_id, started_at))
+        conn.execute("INSERT INTO instance_syncs (entity_id, synced_at) VALUES (?, ?) "
+                     "ON CONFLICT(entity_id) DO UPDATE SET synced_at = MAX(synced_at, excluded.synced_at)", (entity_id, started_at))
+        conn.commit()
+    finally:
+        conn.close()
+    return found
+
+def ensure_synced(api_token: str, entity_id: str, sort_field: str, max_age: float = INSTANCE_SYNC_SECONDS,
+                  db_name: str = task_store.STORE_DB_NAME):
+    """
+    Garante que o índice da entidade exista e não esteja velho demais.
+    Na primeira vez a sincronização é feita na hora (o formulário precisa das
+    instâncias); depois, quando o índice passa de `max_age` segundos, ela é refeita
+    em uma thread em segundo plano, uma por entidade, enquanto as buscas continuam
+    respondendo com o índice atual. Erros da sincronização inicial são propagados.
+    As sincronizações de uma entidade são serializadas neste processo: quem chega
+    durante a sincronização inicial aguarda por ela em vez de iniciar outra.
+    """
+    synced_at = last_synced_at(entity_id, db_name=db_name)
+    if synced_at is None:
+        with _entity_lock(entity_id):
+            if last_synced_at(entity_id, db_name=db_name) is None:
+                sync_instances(api_token, entity_id, sort_field, priority=PRIORITY_NORMAL, db_name=db_name)
+        return
+    if time.time() - synced_at < max_age: return
+    with _syncing_lock:
+        if entity_id in _syncing: return
+        _syncing.add(entity_id)
+
+    def run():
+        try:
+            with _entity_lock(entity_id):
+                sync_instances(api_token, entity_id, sort_field, db_name=db_name)
+        except Exception as e:
+            print(f"Erro ao sincronizar as instâncias da entidade {entity_id}: {e}")
+        finally:
+            with _syncing_lock: _syncing.discard(entity_id)
+
+    threading.Thread(target=run, name=f"instance-sync-{entity_id}", daemon=True).start()
+
+def search_instances(entity_id: str, query: str = "", limit: int = SEARCH_LIMIT, db_name: str = task_store.STORE_DB_NAME) -> dict:
+    """
+    Busca no índice local (sem chamadas à API) as instâncias cujo nome, ou alguma
+    palavra do nome, começa com `query`, sem diferenciar maiúsculas nem acentos.
+    Retorna {nome de exibição: instance_id}, em ordem alfabética, com no máximo `limit` itens.
+    """
+    prefix = normalize_name(query)
+    conn = task_store.get_store_connection(db_name)
+    try:
+        if not prefix:
+            rows = conn.execute("SELECT instance_id, display_name FROM instances WHERE entity_id = ? ORDER BY search_name LIMIT ?", (entity_id, limit)).fetchall()
+        else:
+            # A comparação por intervalo usa o índice em (entity_id, search_name)
+            rows = conn.execute(
+                "SELECT instance_id, display_name FROM instances WHERE entity_id = ? "
+                "AND ((search_name >= ? AND search_name < ?) OR instr(search_name, ?) > 0) "
+                "ORDER BY search_name >= ? AND search_name < ? DESC, search_name LIMIT ?",
+                (entity_id, prefix, prefix + '\U0010ffff', ' ' + prefix, prefix, prefix + '\U0010ffff', limit)
+            ).fetchall()
+    finally:
+        conn.close()
+    return {row['display_name']: row['instance_id'] for row in rows}
@@ -0,0 +1,51 @@
+import json
+import logging
+import sys
+import time
+from contextlib import contextmanager
+
+# Logger das linhas de log estruturadas (JSON, uma por evento)
+perf_logger = logging.getLogger("board.perf")
+if not perf_logger.handlers:
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    perf_logger.addHandler(_handler)
+    perf_logger.setLevel(logging.INFO)
+    perf_logger.propagate = False
+
+def log_event(event: str, **fields):
+    """Emite uma linha de log JSON com o nome do evento, o horário e os campos informados."""
+    perf_logger.info(json.dumps({'event': event, 'ts': round(time.time(), 3), **fields}, default=str, ensure_ascii=False))
+
+class PhaseTimer:
+    """
+    Cronometra as fases de uma execução (ex.: uma renderização do quadro).
+    Uso: `with timer.phase('cards'): ...`; os tempos ficam em `timer.phases` (segundos).
+    `record_request` acumula, por endpoint, as chamadas feitas durante a execução.
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.requests = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def record_request(self, endpoint: str, seconds: float, ok: bool = True):
+        entry = self.requests.setdefault(endpoint, {'requests': 0, 'errors': 0, 'total_time': 0.0, 'max_time': 0.0})
+        entry['requests'] += 1
+        entry['errors'] += 0 if ok else 1
+        entry['total_time'] += seconds
+        entry['max_time'] = max(entry['max_time'], seconds)
+
+    def total(self) -> float:
+        return time.perf_counter() - self._start
+
+    def as_dict(self) -> dict:
+        return {name: round(seconds, 4) for name, seconds in self.phases.items()}
@@ -1,27 +1,9 @@
 window.addEventListener('load', function() {
 
-    // --- LÓGICA DE ATUALIZAÇÃO AUTOMÁTICA ---
-    setInterval(() => {
-        // Encontra o botão de atualização pelo seu conteúdo (emoji)
-        // A busca é feita no 'parent.document' porque o componente Streamlit roda num iframe.
-        const buttons = window.parent.document.querySelectorAll('button');
-        let refreshButton = null;
-        buttons.forEach(button => {
-            if (button.textContent.includes('🔄')) {
-                refreshButton = button;
-            }
-        });
-
-        if (refreshButton) {
-            console.log('Auto-refresh: Clicando no botão de atualização.');
-            refreshButton.click();
-        } else {
-            console.log('Auto-refresh: Botão de atualização não encontrado.');
-        }
-    }, 60000); // 60000ms = 60 segundos
-
+    // A atualização automática é feita pelo app: um worker no servidor remonta o
+    // quadro e cada sessão só executa o script novamente quando a versão muda.
 
-    // --- LÓGICA DO DIAGRAMA BPMN (existente, sem alterações) ---
+    // --- LÓGICA DO DIAGRAMA BPMN ---
     if (window.bpmnData && window.bpmnData.xmlB64) {
         
         const bpmnContainer = document.getElementById('canvas');
@@ -39,41 +21,55 @@ window.addEventListener('load', function() {
             resetZoom: () => viewer.get('canvas').zoom(1)
         };
         
-        function normalizeString(str) {
-            if (typeof str !== 'string') return '';
-            return str.normalize('NFD').replace(/[\u0300-\u036f]/g, '').toLowerCase().trim();
-        }
+        const STATE_COLORS = {
+            completed: { fill: '#d4edda', stroke: '#155724' },
+            pending: { fill: '#fff3cd', stroke: '#856404' }
+        };
 
-        function findElementsByName(registry, nameToFind) {
-            const normalizedNameToFind = normalizeString(nameToFind);
-            return registry.filter(el => {
-                if (el.businessObject && el.businessObject.name) {
-                    const normalizedElementName = normalizeString(el.businessObject.name);
-                    return normalizedElementName === normalizedNameToFind;
-                }
-                return false;
-            });
+        // Só colore depois que o diagrama foi importado
+        let diagramReady = false;
+
+        function paintElement(element, state) {
+            const gfx = viewer.get('elementRegistry').getGraphics(element);
+            const visual = gfx && gfx.querySelector('.djs-visual > *');
+            if (!visual) return;
+            // Sem estado, volta às cores originais do diagrama
+            const colors = STATE_COLORS[state] || { fill: '', stroke: '' };
+            visual.style.fill = colors.fill;
+            visual.style.stroke = colors.stroke;
         }
 
-        function colorElements() {
+        // Recolore no lugar apenas os elementos informados: { idDoElemento: 'completed' | 'pending' | null }.
+        // O app já resolve os nomes das tarefas para ids (bpmn_mapping.py). Com `reset`,
+        // todas as cores são removidas antes.
+        function applyTaskStates(changes, reset) {
+            if (!diagramReady) return;
             const elementRegistry = viewer.get('elementRegistry');
-            const { completedTasks, pendingTasks } = window.bpmnData;
-            completedTasks.forEach(name => {
-                const elements = findElementsByName(elementRegistry, name);
-                elements.forEach(element => {
-                    const gfx = elementRegistry.getGraphics(element);
-                    if (gfx) { const visual = gfx.querySelector('.djs-visual > *'); if (visual) { visual.style.fill = '#d4edda'; visual.style.stroke = '#155724'; }}
-                });
-            });
-            pendingTasks.forEach(name => {
-                const elements = findElementsByName(elementRegistry, name);
-                elements.forEach(element => {
-                    const gfx = elementRegistry.getGraphics(element);
-                    if (gfx) { const visual = gfx.querySelector('.djs-visual > *'); if (visual) { visual.style.fill = '#fff3cd'; visual.style.stroke = '#856404'; }}
-                });
+            if (reset) elementRegistry.forEach(element => paintElement(element, null));
+            Object.entries(changes).forEach(([elementId, state]) => {
+                const element = elementRegistry.get(elementId);
+                if (element) paintElement(element, state);
             });
         }
-        
+
+        // Estado completo mantido na página pelo app (veja bpmn_messenger.js)
+        function currentTaskStates() {
+            try {
+                const store = window.parent.__bpmnTaskStates || {};
+                return store[window.bpmnData.processId] || {};
+            } catch (e) {
+                return {};
+            }
+        }
+
+        // Atualizações enviadas pelo app sem recriar o iframe nem reimportar o diagrama
+        window.addEventListener('message', (event) => {
+            const message = event.data;
+            if (message && message.type === 'bpmn-task-states' && message.processId === window.bpmnData.processId) {
+                applyTaskStates(message.changes, message.reset);
+            }
+        });
+
         async function importDiagram() {
             try {
                 const base64ToUtf8 = (str) => {
@@ -93,7 +89,7 @@ window.addEventListener('load', function() {
 
                 function safeInitializeView() {
                     if (bpmnContainer && bpmnContainer.clientWidth > 0) {
-                        try { viewer.get('canvas').zoom('fit-viewport'); colorElements(); } catch (e) { console.error("Erro no zoom/cor:", e); }
+                        try { viewer.get('canvas').zoom('fit-viewport'); diagramReady = true; applyTaskStates(currentTaskStates()); } catch (e) { console.error("Erro no zoom/cor:", e); }
                     } else { setTimeout(safeInitializeView, 50); }
                 }
                 safeInitializeView();
@@ -0,0 +1,131 @@
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+# Classes de prioridade: quanto menor o número, maior a prioridade
+PRIORITY_INTERACTIVE = 0  # ações do usuário (ex.: iniciar um workflow, abrir um diagrama)
+PRIORITY_NORMAL = 1
+PRIORITY_BACKGROUND = 2   # atualizações em segundo plano (histórico, datas de vencimento)
+
+# Fração da capacidade do limite global que cada prioridade não pode consumir,
+# reservada às prioridades mais altas
+PRIORITY_RESERVE = {PRIORITY_INTERACTIVE: 0.0, PRIORITY_NORMAL: 0.1, PRIORITY_BACKGROUND: 0.25}
+
+# Tempo máximo (segundos) que uma chamada aguarda pelo limite, por prioridade
+PRIORITY_TIMEOUT = {PRIORITY_INTERACTIVE: 30, PRIORITY_NORMAL: 30, PRIORITY_BACKGROUND: 60}
+
+load_dotenv()
+
+# Limite global de chamadas à API do Holmes (por segundo) e rajada máxima
+DEFAULT_RATE = float(os.getenv('HOLMES_RATE_LIMIT', 20))
+DEFAULT_BURST = float(os.getenv('HOLMES_RATE_BURST', 40))
+
+# Limites por endpoint (chamadas por segundo, rajada), dentro do limite global
+DEFAULT_ENDPOINT_BUDGETS = {
+    '/v1/processes/{id}/history': (10, 20),
+    '/v1/tasks/{id}': (10, 20),
+}
+
+class RateLimitExceeded(Exception):
+    """A chamada não obteve permissão do limitador dentro do tempo máximo de espera."""
+
+class TokenBucket:
+    """Balde de fichas: `rate` fichas por segundo, acumulando no máximo `capacity`. Não é thread-safe."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Segundos até o balde ter `amount` fichas (0 se já tiver)."""
+        return max(0.0, (amount - self.tokens) / self.rate) if self.rate > 0 else float('inf')
+
+class RateLimiter:
+    """
+    Limitador de chamadas thread-safe, com um balde global e um balde por endpoint.
+    Uma chamada só é liberada quando há ficha nos dois baldes, sem usar a reserva
+    das prioridades mais altas e sem nenhuma chamada de prioridade mais alta
+    aguardando. `throttle` suspende todas as chamadas (ex.: após um 429 com Retry-After).
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: float = DEFAULT_BURST, endpoint_budgets: dict | None = None):
+        self._global = TokenBucket(rate, burst)
+        self._budgets = dict(DEFAULT_ENDPOINT_BUDGETS if endpoint_budgets is None else endpoint_budgets)
+        self._buckets = {}
+        self._waiting = {priority: 0 for priority in PRIORITY_RESERVE}
+        self._paused_until = 0.0
+        self._condition = threading.Condition()
+        self._stats = {'granted': 0, 'waited': 0, 'wait_time': 0.0, 'rejected': 0, 'throttled': 0}
+
+    def _bucket(self, endpoint: str) -> TokenBucket | None:
+        if endpoint not in self._budgets: return None
+        bucket = self._buckets.get(endpoint)
+        if bucket is None:
+            bucket = self._buckets[endpoint] = TokenBucket(*self._budgets[endpoint])
+        return bucket
+
+    def _wait_time(self, endpoint: str, priority: int, now: float) -> float:
+        """Segundos até a chamada poder ser liberada (0 = agora). Deve ser chamada com o lock."""
+        if now < self._paused_until:
+            return self._paused_until - now
+        if any(self._waiting[p] for p in self._waiting if p < priority):
+            return 0.05
+        self._global.refill(now)
+        waits = [self._global.wait_time(1 + PRIORITY_RESERVE[priority] * self._global.capacity)]
+        bucket = self._bucket(endpoint)
+        if bucket is not None:
+            bucket.refill(now)
+            waits.append(bucket.wait_time(1))
+        return max(waits)
+
+    def acquire(self, endpoint: str, priority: int = PRIORITY_NORMAL, timeout: float | None = None):
+        """
+        Aguarda a permissão para uma chamada ao `endpoint` (veja `holmes_api.endpoint_key`).
+        Levanta `RateLimitExceeded` se ela não vier em `timeout` segundos
+        (padrão: PRIORITY_TIMEOUT da prioridade).
+        """
+        deadline = time.monotonic() + (PRIORITY_TIMEOUT[priority] if timeout is None else timeout)
+        start = time.monotonic()
+        with self._condition:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._wait_time(endpoint, priority, now)
+                    if wait <= 0: break
+                    if now + wait > deadline:
+                        self._stats['rejected'] += 1
+                        raise RateLimitExceeded(f"Limite de chamadas à API atingido para {endpoint}")
+                    self._condition.wait(wait)
+            finally:
+                self._waiting[priority] -= 1
+            self._global.tokens -= 1
+            bucket = self._bucket(endpoint)
+            if bucket is not None: bucket.tokens -= 1
+            self._stats['granted'] += 1
+            waited = time.monotonic() - start
+            if waited > 0.001:
+                self._stats['waited'] += 1
+                self._stats['wait_time'] += waited
+            # Outras chamadas podem ter ficado esperando por esta (ex.: prioridade mais baixa)
+            self._condition.notify_all()
+
+    def throttle(self, seconds: float):
+        """Suspende todas as chamadas por `seconds` segundos (resposta 429 da API)."""
+        with self._condition:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._stats['throttled'] += 1
+
+    def stats(self) -> dict:
+        with self._condition:
+            return dict(self._stats)
+
+# Limitador compartilhado por todos os clientes do processo do servidor
+shared_limiter = RateLimiter()
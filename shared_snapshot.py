@@ -0,0 +1,128 @@
+import json
+import sqlite3
+import time
+import zlib
+
+class SharedSnapshotStore:
+    """
+    Armazenamento, em um arquivo SQLite compartilhado pelos processos do servidor
+    (réplicas), do snapshot do quadro e da eleição do processo que o monta.
+
+    - board_lease: um único "líder" por quadro, com um prazo (lease) que ele renova
+      a cada ciclo. Se o líder parar, outro processo assume quando o prazo vence.
+    - board_snapshots: a última versão publicada pelo líder (JSON comprimido) e o
+      horário da última montagem, usado para medir a idade dos dados.
+    Os demais processos apenas leem o cabeçalho (versão e horário) a cada ciclo e
+    só carregam o conteúdo quando a versão muda.
+    """
+
+    def __init__(self, db_name: str):
+        self.db_name = db_name
+        conn = self._connect()
+        try:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS board_lease (
+                    name TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    refresh_requested_at REAL NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS board_snapshots (
+                    name TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL,
+                    built_at REAL NOT NULL,
+                    payload BLOB NOT NULL
+                );
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_name, timeout=30, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def try_acquire(self, name: str, owner: str, lease_seconds: float) -> bool:
+        """Assume (ou renova) a liderança do quadro `name`. Retorna True se `owner` for o líder."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT INTO board_lease (name, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE board_lease.owner = excluded.owner OR board_lease.expires_at < ?",
+                (name, owner, now + lease_seconds, now)
+            )
+            row = conn.execute("SELECT owner FROM board_lease WHERE name = ?", (name,)).fetchone()
+            conn.execute("COMMIT")
+            return row is not None and row[0] == owner
+        finally:
+            conn.close()
+
+    def request_refresh(self, name: str) -> float:
+        """Pede ao líder uma atualização antecipada. Retorna o horário do pedido."""
+        requested_at = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("UPDATE board_lease SET refresh_requested_at = MAX(refresh_requested_at, ?) WHERE name = ?", (requested_at, name))
+        finally:
+            conn.close()
+        return requested_at
+
+    def refresh_requested_at(self, name: str) -> float:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT refresh_requested_at FROM board_lease WHERE name = ?", (name,)).fetchone()
+            return row[0] if row else 0
+        finally:
+            conn.close()
+
+    def read_header(self, name: str) -> tuple[int, float] | None:
+        """(versão, horário da última montagem) do snapshot publicado, ou None."""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT version, built_at FROM board_snapshots WHERE name = ?", (name,)).fetchone()
+            return (row[0], row[1]) if row else None
+        finally:
+            conn.close()
+
+    def load(self, name: str) -> tuple[int, float, dict] | None:
+        """(versão, horário da última montagem, conteúdo) do snapshot publicado, ou None."""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT version, built_at, payload FROM board_snapshots WHERE name = ?", (name,)).fetchone()
+        finally:
+            conn.close()
+        if row is None: return None
+        return row[0], row[1], json.loads(zlib.decompress(row[2]))
+
+    def publish(self, name: str, owner: str, version: int, built_at: float, payload: dict | None) -> bool:
+        """
+        Publica uma montagem do líder. Com `payload=None` (nada mudou), só o horário
+        da montagem é atualizado. A escrita é descartada se `owner` não for mais o
+        líder ou se já houver uma versão mais nova publicada. Retorna True se gravou.
+        """
+        blob = zlib.compress(json.dumps(payload, separators=(',', ':'), default=str).encode('utf-8')) if payload is not None else None
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT owner FROM board_lease WHERE name = ?", (name,)).fetchone()
+            if row is None or row[0] != owner:
+                conn.execute("ROLLBACK")
+                return False
+            if blob is None:
+                cursor = conn.execute("UPDATE board_snapshots SET built_at = ? WHERE name = ? AND version = ?", (built_at, name, version))
+            else:
+                cursor = conn.execute(
+                    "INSERT INTO board_snapshots (name, version, built_at, payload) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET version = excluded.version, built_at = excluded.built_at, payload = excluded.payload "
+                    "WHERE excluded.version >= board_snapshots.version",
+                    (name, version, built_at, blob)
+                )
+            conn.execute("COMMIT")
+            return cursor.rowcount > 0
+        finally:
+            conn.close()
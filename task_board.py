@@ -0,0 +1,225 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import takewhile
+import task_store
+from holmes_api import API_BASE_URL, get_client
+from api_cache import cached_request_json, TTL_HISTORY, TTL_TASK, TTL_PROCESSES
+from timestamps import parse_timestamp, MIN_TIMESTAMP
+from rate_limiter import PRIORITY_BACKGROUND
+
+# Número padrão de chamadas simultâneas à API durante a montagem do quadro
+DEFAULT_MAX_WORKERS = 8
+
+# Quantidade de entradas de histórico pedidas por página
+HISTORY_PAGE_SIZE = 100
+
+# Quantidade de tarefas cujas datas de vencimento são buscadas e gravadas por lote
+DUE_DATE_BATCH_SIZE = 50
+
+# Intervalo (segundos) entre as sincronizações do histórico de um processo fechado.
+# Depois da primeira sincronização feita já com o processo fechado, suas tarefas
+# vêm do armazenamento local; a nova verificação só cobre alterações tardias.
+CLOSED_PROCESS_SYNC_SECONDS = 6 * 3600
+
+PROCESSES_URL = f"{API_BASE_URL}/processes/"
+
+def fetch_processes(api_token: str, process_name: str | None = None) -> list:
+    """
+    Retorna os processos (exceto os cancelados), opcionalmente filtrados pelo nome.
+    Erros são propagados como exceção.
+    """
+    processes_data = cached_request_json(get_client(api_token), PROCESSES_URL, TTL_PROCESSES, priority=PRIORITY_BACKGROUND)
+    processes = processes_data.get('processes', []) if processes_data else []
+    if process_name:
+        processes = [p for p in processes if p.get('name') == process_name]
+    return [p for p in processes if p.get('status') != 'canceled']
+
+def history_url(process_id: str) -> str:
+    return f"{API_BASE_URL}/processes/{process_id}/history"
+
+def task_url(task_id: str) -> str:
+    return f"{API_BASE_URL}/tasks/{task_id}"
+
+def history_payload(page: int, per_page: int = HISTORY_PAGE_SIZE) -> dict:
+    """
+    Payload do /history para uma página. O histórico é pedido do mais recente para
+    o mais antigo, para que a sincronização incremental possa parar assim que
+    alcançar a marca d'água do processo.
+    """
+    return {"filters": [], "page": page, "per_page": per_page, "sortBy": ["created_at", "desc"]}
+
+def iter_history_pages(fetch_page, per_page: int = HISTORY_PAGE_SIZE, prefetch: bool = False, has_more=None):
+    """
+    Gerador que percorre todas as páginas do histórico de um processo, produzindo
+    a lista de entradas de cada página. `fetch_page(page)` deve retornar a resposta
+    do /history da página pedida (exceções são propagadas ao consumidor).
+    A leitura termina na primeira página com menos de `per_page` entradas ou, se
+    `has_more(histories)` for informado, na primeira página depois da qual ele
+    indica que não há mais nada a ler (ex.: a marca d'água foi alcançada).
+    Com `prefetch=True`, a próxima página é buscada enquanto a atual é processada,
+    mas só quando ela ainda pode ser lida.
+    """
+    def next_page_needed(histories):
+        return len(histories) >= per_page and (has_more is None or has_more(histories))
+
+    if not prefetch:
+        page = 1
+        while True:
+            histories = (fetch_page(page) or {}).get('histories', [])
+            if histories: yield histories
+            if not next_page_needed(histories): return
+            page += 1
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        page = 1
+        future = executor.submit(fetch_page, page)
+        try:
+            while future:
+                histories = (future.result() or {}).get('histories', [])
+                page += 1
+                future = executor.submit(fetch_page, page) if next_page_needed(histories) else None
+                if histories: yield histories
+        finally:
+            # Se o consumidor parar antes do fim, a página antecipada é descartada
+            if future: future.cancel()
+
+def enrich_due_dates(task_ids: list, fetch_task, executor, batch_size: int = DUE_DATE_BATCH_SIZE, bulk_fetch=None):
+    """
+    Gerador que busca as datas de vencimento das tarefas em lotes de `batch_size`,
+    produzindo um dicionário {task_id: due_date} por lote (`None` quando a tarefa
+    não tem vencimento). Tarefas cuja busca falhou ficam de fora do lote, para
+    serem tentadas novamente na próxima atualização.
+    Se `bulk_fetch(task_ids) -> {task_id: due_date}` for informado (para um endpoint
+    de busca em massa), ele é usado no lugar de uma chamada ao /tasks/{id} por tarefa,
+    que são feitas em paralelo no `executor`.
+    """
+    for start in range(0, len(task_ids), batch_size):
+        batch = task_ids[start:start + batch_size]
+        if bulk_fetch:
+            yield bulk_fetch(batch)
+            continue
+        due_dates = {}
+        for task_id, task_api_data in zip(batch, executor.map(fetch_task, batch)):
+            if task_api_data is not None:
+                due_dates[task_id] = task_api_data.get('due_date') or None
+        yield due_dates
+
+def build_all_tasks(processes: list, api_token: str, max_workers: int = DEFAULT_MAX_WORKERS, prefetch_history: bool = False, db_name: str = task_store.STORE_DB_NAME) -> tuple[dict, dict, list, dict]:
+    """
+    Sincroniza o armazenamento local (task_store) com as entradas de histórico
+    novas de cada processo e monta o dicionário `all_tasks` a partir dele.
+    A data de vencimento de uma tarefa pendente é guardada até a tarefa ser
+    concluída e só é buscada de novo quando a tarefa recebe uma nova entrada de
+    histórico ou depois de `task_store.DUE_DATE_TTL` segundos.
+    As chamadas à API são executadas em paralelo com no máximo `max_workers`
+    processos simultâneos. O histórico de cada processo é percorrido página a página,
+    uma única vez, até alcançar a marca d'água; `prefetch_history` antecipa a
+    busca da página seguinte. Processos fechados ('closed') são sincronizados uma
+    vez depois do fechamento e, a partir daí, apenas a cada `CLOSED_PROCESS_SYNC_SECONDS`;
+    suas tarefas continuam vindo do armazenamento.
+    Retorna uma tupla: (process_id_map, all_tasks, errors, stats), onde `errors` é uma
+    lista de (url, exceção) para que o app decida como exibi-los e `stats` contém
+    o número de requisições (páginas) de histórico e de tarefas que foram de fato à API
+    nesta montagem (respostas vindas do cache compartilhado não são contadas), o
+    tempo, em segundos, da sincronização do histórico e da busca das datas de vencimento
+    o número de tarefas marcadas como desatualizadas e o de processos fechados que
+    não precisaram ser sincronizados.
+    As chamadas usam a prioridade de segundo plano do limitador. Quando o histórico
+    de um processo ou a data de vencimento de uma tarefa não pode ser atualizado
+    (erro ou limite de chamadas), as tarefas afetadas continuam no quadro, com os
+    últimos dados conhecidos, e recebem `stale = True`.
+    """
+    errors = []
+    stats = {'history_requests': 0, 'task_requests': 0}
+    stats_lock = threading.Lock()
+    stale_process_ids = set()
+
+    client = get_client(api_token)
+
+    def count(stat):
+        def on_miss():
+            with stats_lock: stats[stat] += 1
+        return on_miss
+
+    def fetch_history_page(process_id, page):
+        return cached_request_json(client, history_url(process_id), TTL_HISTORY, method='POST', payload=history_payload(page), idempotent=True, on_miss=count('history_requests'), priority=PRIORITY_BACKGROUND)
+
+    def sync_process(process_id, process_identifier, since, closed):
+        started_at = time.time()
+        since = parse_timestamp(since)
+        newest = None
+
+        def is_new(hist):
+            return not since or (parse_timestamp(hist.get('created_at')) or MIN_TIMESTAMP) >= since
+
+        try:
+            # O histórico vem do mais recente para o mais antigo: se a última entrada da
+            # página já é anterior à marca d'água, a página seguinte nem é pedida
+            pages = iter_history_pages(lambda page: fetch_history_page(process_id, page), prefetch=prefetch_history,
+                                       has_more=lambda histories: is_new(histories[-1]))
+            for histories in pages:
+                entries = list(takewhile(is_new, histories))
+                # Entradas com o mesmo `created_at` da marca d'água são reaplicadas,
+                # o que é seguro porque a gravação no armazenamento é idempotente.
+                page_newest = task_store.apply_history(process_id, process_identifier, entries, db_name=db_name)
+                if page_newest and (newest is None or parse_timestamp(page_newest) > parse_timestamp(newest)):
+                    newest = page_newest
+                if len(entries) < len(histories): break
+        except Exception as e:
+            errors.append((history_url(process_id), e))
+            stale_process_ids.add(process_id)
+            return
+        task_store.set_watermark(process_id, process_identifier, newest, closed_synced_at=started_at if closed else None, db_name=db_name)
+
+    def fetch_task(task_id):
+        try:
+            return cached_request_json(client, task_url(task_id), TTL_TASK, on_miss=count('task_requests'), priority=PRIORITY_BACKGROUND)
+        except Exception as e:
+            errors.append((task_url(task_id), e))
+            return None
+
+    process_id_map = {}
+    valid_processes = []
+    for process in processes:
+        process_id = process.get('id')
+        process_identifier = process.get('identifier')
+        if not process_id or not process_identifier: continue
+        process_id_map[process_identifier] = process_id
+        valid_processes.append((process_id, process_identifier, process.get('status') == 'closed'))
+    process_ids = [process_id for process_id, _, _ in valid_processes]
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        phase_start = time.perf_counter()
+        watermarks = task_store.get_watermarks(process_ids, db_name=db_name)
+        closed_synced_at = task_store.get_closed_synced_at([p[0] for p in valid_processes if p[2]], db_name=db_name)
+        now = time.time()
+        to_sync = [p for p in valid_processes if p[0] not in closed_synced_at or now - closed_synced_at[p[0]] >= CLOSED_PROCESS_SYNC_SECONDS]
+        stats['skipped_closed_processes'] = len(valid_processes) - len(to_sync)
+        # `list` aguarda a sincronização de todos os processos antes da leitura do armazenamento
+        list(executor.map(lambda p: sync_process(p[0], p[1], watermarks.get(p[0]), p[2]), to_sync))
+        all_tasks = task_store.load_all_tasks(process_ids, db_name=db_name)
+        stats['history_seconds'] = round(time.perf_counter() - phase_start, 4)
+
+        # Datas de vencimento: apenas das tarefas pendentes que não estão no armazenamento ou expiraram
+        phase_start = time.perf_counter()
+        task_store.prune_due_dates(db_name=db_name)
+        unknown_ids = [task_id for task_id, task_details in all_tasks.items() if task_details.pop('due_date_known', True) is False]
+        missing_ids = set(unknown_ids)
+        for due_dates in enrich_due_dates(unknown_ids, fetch_task, executor):
+            task_store.save_due_dates(due_dates, db_name=db_name)
+            missing_ids.difference_update(due_dates)
+            for task_id, due_date in due_dates.items():
+                if due_date:
+                    all_tasks[task_id]['due_date'] = due_date
+                else:
+                    all_tasks[task_id].pop('due_date', None)
+        stats['due_dates_seconds'] = round(time.perf_counter() - phase_start, 4)
+
+    # Tarefas cujos dados não puderam ser atualizados nesta montagem
+    for task_id, task_details in all_tasks.items():
+        if task_id in missing_ids or task_details['process_id'] in stale_process_ids:
+            task_details['stale'] = True
+    stats['stale_tasks'] = sum(1 for task_details in all_tasks.values() if task_details.get('stale'))
+
+    return process_id_map, all_tasks, errors, stats
@@ -0,0 +1,225 @@
+import sqlite3
+import threading
+import time
+from timestamps import normalize_timestamp, parse_timestamp
+
+# Nome do arquivo do banco de dados local das tarefas (ao lado do auth.db)
+STORE_DB_NAME = "tasks.db"
+
+# Tempo (segundos) depois do qual a data de vencimento guardada de uma tarefa
+# pendente é buscada de novo, caso o prazo tenha sido alterado sem que uma nova
+# entrada de histórico da tarefa tenha aparecido
+DUE_DATE_TTL = 3600
+
+# Bancos já inicializados neste processo (o app chama `init_store` a cada rerun)
+_initialized = set()
+_init_lock = threading.Lock()
+
+def get_store_connection(db_name: str = STORE_DB_NAME):
+    """
+    Cria e retorna uma conexão com o banco de dados local das tarefas.
+    """
+    conn = sqlite3.connect(db_name, timeout=30, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def init_store(db_name: str = STORE_DB_NAME):
+    """
+    Cria as tabelas do armazenamento local, caso não existam:
+    - processes: último `created_at` sincronizado de cada processo (marca d'água) e,
+      para os processos fechados, o horário da última sincronização feita depois do fechamento;
+    - tasks: tarefas descobertas no histórico;
+    - completions: data de conclusão mais recente (history.take_action) de cada tarefa;
+    - due_dates: data de vencimento já buscada de cada tarefa pendente (pode ser nula)
+      e o horário da busca.
+    Cada banco é inicializado uma única vez por processo.
+    """
+    with _init_lock:
+        if db_name in _initialized: return
+        _init_tables(db_name)
+        _initialized.add(db_name)
+
+def _init_tables(db_name: str):
+    conn = get_store_connection(db_name)
+    try:
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS processes (
+                process_id TEXT PRIMARY KEY,
+                process_identifier TEXT NOT NULL,
+                last_synced_at TEXT
+            );
+            CREATE TABLE IF NOT EXISTS tasks (
+                task_id TEXT PRIMARY KEY,
+                process_id TEXT NOT NULL,
+                process_identifier TEXT NOT NULL,
+                task_name TEXT,
+                long_link TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_tasks_process_id ON tasks (process_id);
+            CREATE TABLE IF NOT EXISTS completions (
+                task_id TEXT PRIMARY KEY,
+                completion_date TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS due_dates (
+                task_id TEXT PRIMARY KEY,
+                due_date TEXT
+            );
+        """)
+        columns = [row['name'] for row in conn.execute("PRAGMA table_info(processes)")]
+        if 'closed_synced_at' not in columns:
+            conn.execute("ALTER TABLE processes ADD COLUMN closed_synced_at REAL")
+        columns = [row['name'] for row in conn.execute("PRAGMA table_info(due_dates)")]
+        if 'fetched_at' not in columns:
+            conn.execute("ALTER TABLE due_dates ADD COLUMN fetched_at REAL")
+        conn.commit()
+    finally:
+        conn.close()
+
+def get_watermarks(process_ids: list, db_name: str = STORE_DB_NAME) -> dict:
+    """Retorna {process_id: last_synced_at} dos processos já sincronizados."""
+    if not process_ids: return {}
+    conn = get_store_connection(db_name)
+    try:
+        placeholders = ",".join("?" * len(process_ids))
+        rows = conn.execute(f"SELECT process_id, last_synced_at FROM processes WHERE process_id IN ({placeholders})", list(process_ids)).fetchall()
+        return {row['process_id']: row['last_synced_at'] for row in rows}
+    finally:
+        conn.close()
+
+def get_closed_synced_at(process_ids: list, db_name: str = STORE_DB_NAME) -> dict:
+    """Retorna {process_id: horário} da última sincronização dos processos já fechados nela."""
+    if not process_ids: return {}
+    conn = get_store_connection(db_name)
+    try:
+        placeholders = ",".join("?" * len(process_ids))
+        rows = conn.execute(f"SELECT process_id, closed_synced_at FROM processes WHERE process_id IN ({placeholders}) AND closed_synced_at IS NOT NULL", list(process_ids)).fetchall()
+        return {row['process_id']: row['closed_synced_at'] for row in rows}
+    finally:
+        conn.close()
+
+def apply_history(process_id: str, process_identifier: str, histories, db_name: str = STORE_DB_NAME) -> str | None:
+    """
+    Grava no armazenamento as entradas de histórico de um processo, em qualquer ordem.
+    A operação é idempotente: reaplicar uma entrada já gravada não altera o resultado.
+    Retorna o `created_at` mais recente entre as entradas gravadas (ou None).
+    As datas são gravadas na forma canônica de `normalize_timestamp`, para que
+    as comparações feitas pelo SQLite sigam a ordem cronológica.
+    A marca d'água do processo não é alterada aqui; veja `set_watermark`.
+    Uma entrada de uma tarefa (exceto a conclusão) posterior à busca da data de
+    vencimento guardada a descarta, para que ela seja buscada de novo na próxima
+    montagem (o prazo pode ter sido alterado).
+    """
+    conn = get_store_connection(db_name)
+    try:
+        newest = None
+        for hist in histories:
+            created_at = normalize_timestamp(hist.get('created_at', ''))
+            if parse_timestamp(created_at) and (newest is None or parse_timestamp(created_at) > parse_timestamp(newest)):
+                newest = created_at
+            props = hist.get('properties', {})
+            task_id = props.get('task_id')
+            if task_id and props.get('long_link'):
+                # Mantém os dados da entrada mais antiga em que a tarefa apareceu.
+                # Em caso de empate prevalece a última gravada, pois o histórico
+                # é lido do mais recente para o mais antigo.
+                conn.execute(
+                    "INSERT INTO tasks (task_id, process_id, process_identifier, task_name, long_link, created_at) VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(task_id) DO UPDATE SET process_id = excluded.process_id, process_identifier = excluded.process_identifier, "
+                    "task_name = excluded.task_name, long_link = excluded.long_link, created_at = excluded.created_at "
+                    "WHERE excluded.created_at <= tasks.created_at",
+                    (task_id, process_id, process_identifier, props.get('task_name'), props.get('long_link'), created_at)
+                )
+            if hist.get('key') == 'history.take_action' and task_id and created_at:
+                conn.execute(
+                    "INSERT INTO completions (task_id, completion_date) VALUES (?, ?) "
+                    "ON CONFLICT(task_id) DO UPDATE SET completion_date = MAX(completion_date, excluded.completion_date)",
+                    (task_id, created_at)
+                )
+            elif task_id and parse_timestamp(created_at):
+                conn.execute("DELETE FROM due_dates WHERE task_id = ? AND (fetched_at IS NULL OR fetched_at < ?)",
+                             (task_id, parse_timestamp(created_at).timestamp()))
+        conn.commit()
+        return newest
+    finally:
+        conn.close()
+
+def set_watermark(process_id: str, process_identifier: str, watermark: str | None, closed_synced_at: float | None = None,
+                  db_name: str = STORE_DB_NAME):
+    """
+    Registra o processo e avança sua marca d'água para `watermark`. Deve ser
+    chamada somente depois que todo o histórico novo do processo foi gravado,
+    para que uma sincronização interrompida seja refeita por completo.
+    `closed_synced_at` é o início da sincronização quando o processo já estava
+    fechado; para processos abertos (None), a marca de fechamento é apagada.
+    """
+    conn = get_store_connection(db_name)
+    try:
+        conn.execute(
+            "INSERT INTO processes (process_id, process_identifier, last_synced_at, closed_synced_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(process_id) DO UPDATE SET process_identifier = excluded.process_identifier, "
+            "last_synced_at = COALESCE(MAX(last_synced_at, excluded.last_synced_at), last_synced_at, excluded.last_synced_at), "
+            "closed_synced_at = excluded.closed_synced_at",
+            (process_id, process_identifier, watermark, closed_synced_at)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+def load_all_tasks(process_ids: list, db_name: str = STORE_DB_NAME) -> dict:
+    """
+    Monta o dicionário `all_tasks` (mesma estrutura usada pelo app) com as
+    tarefas dos processos informados, já com o estado de conclusão e, para as
+    pendentes, a data de vencimento guardada. As tarefas pendentes cuja data de
+    vencimento ainda não foi buscada, ou foi buscada há mais de `DUE_DATE_TTL`
+    segundos, recebem `due_date_known = False` (a data antiga, se houver, é mantida
+    até a nova busca).
+    """
+    if not process_ids: return {}
+    conn = get_store_connection(db_name)
+    try:
+        placeholders = ",".join("?" * len(process_ids))
+        rows = conn.execute(f"""
+            SELECT t.task_id, t.process_id, t.process_identifier, t.task_name, t.long_link, t.created_at, c.completion_date,
+                   COALESCE(d.fetched_at >= ?, 0) AS due_date_known, d.due_date
+            FROM tasks t LEFT JOIN completions c ON c.task_id = t.task_id LEFT JOIN due_dates d ON d.task_id = t.task_id
+            WHERE t.process_id IN ({placeholders})
+            ORDER BY t.rowid
+        """, [time.time() - DUE_DATE_TTL, *process_ids]).fetchall()
+    finally:
+        conn.close()
+
+    all_tasks = {}
+    for row in rows:
+        task = {'process_id': row['process_id'], 'process_identifier': row['process_identifier'], 'task_name': row['task_name'], 'long_link': row['long_link'], 'task_id': row['task_id'], 'created_at': row['created_at']}
+        if row['completion_date']:
+            task['is_completed'] = True
+            task['completion_date'] = row['completion_date']
+        else:
+            if not row['due_date_known']:
+                task['due_date_known'] = False
+            if row['due_date']:
+                task['due_date'] = row['due_date']
+        all_tasks[row['task_id']] = task
+    return all_tasks
+
+def save_due_dates(due_dates: dict, db_name: str = STORE_DB_NAME):
+    """Guarda {task_id: due_date} das tarefas pendentes; `None` indica tarefa sem vencimento."""
+    if not due_dates: return
+    fetched_at = time.time()
+    conn = get_store_connection(db_name)
+    try:
+        conn.executemany("INSERT OR REPLACE INTO due_dates (task_id, due_date, fetched_at) VALUES (?, ?, ?)",
+                         [(task_id, due_date, fetched_at) for task_id, due_date in due_dates.items()])
+        conn.commit()
+    finally:
+        conn.close()
+
+def prune_due_dates(db_name: str = STORE_DB_NAME):
+    """Descarta as datas de vencimento de tarefas que já foram concluídas."""
+    conn = get_store_connection(db_name)
+    try:
+        conn.execute("DELETE FROM due_dates WHERE task_id IN (SELECT task_id FROM completions)")
+        conn.commit()
+    finally:
+        conn.close()
@@ -0,0 +1,42 @@
+from datetime import datetime, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+# Fuso usado na exibição das datas (considera o histórico de horário de verão)
+SAO_PAULO_TZ = ZoneInfo("America/Sao_Paulo")
+
+# Usado na ordenação de tarefas sem data
+MIN_TIMESTAMP = datetime.min.replace(tzinfo=timezone.utc)
+
+# Quantidade de datas distintas mantidas em cada cache
+TIMESTAMP_CACHE_SIZE = 65536
+
+@lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)
+def parse_timestamp(value: str | None) -> datetime | None:
+    """
+    Converte uma data ISO 8601 da API (ex.: '2024-01-01T10:00:00.000Z') em um
+    datetime em UTC. Datas sem fuso são consideradas UTC.
+    Retorna None se o valor estiver vazio ou for inválido.
+    """
+    if not value: return None
+    try:
+        dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+def normalize_timestamp(value: str | None) -> str | None:
+    """
+    Forma canônica de uma data para o armazenamento local: UTC, com milissegundos
+    e sufixo 'Z' (o mesmo formato da API), de modo que a ordem das strings
+    seja a ordem cronológica. Valores inválidos são mantidos como vieram.
+    """
+    dt = parse_timestamp(value)
+    if dt is None: return value
+    return dt.isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+@lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)
+def format_timestamp(dt: datetime, include_time: bool = True) -> str:
+    """Data no horário de São Paulo, como 'dd/mm/aaaa - HH:MM' (ou só 'dd/mm/aaaa')."""
+    local = dt.astimezone(SAO_PAULO_TZ)
+    return local.strftime('%d/%m/%Y - %H:%M') if include_time else local.strftime('%d/%m/%Y')